@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Check and benchmark pause_copy_region.py
+
+Usage:
+    python bench/copy_region.py [length]
+
+Writes a synthetic genome of ``length`` bases (default 20 Mb) to a temporary
+FASTA file, then re-opens it at a repeat region both with Biopython (as the
+tool used to) and with the streaming implementation. Checks the two outputs
+are identical and reports the time taken by each. The streaming version is
+timed twice: first building the .fai index, then reusing it.
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy
+from Bio import SeqIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'bin'))
+import pause_copy_region  # noqa: E402
+
+
+def biopython(path, cut_start, cut_end):
+    records = list(SeqIO.parse(path, "fasta"))
+    record = records[0]
+    record.seq = record.seq[cut_start:] + record.seq[0:cut_start] + \
+        record.seq[cut_start:cut_end]
+    output = io.StringIO()
+    SeqIO.write(records, output, "fasta")
+    return output.getvalue().encode('ascii')
+
+
+def streaming(path, cut_start, cut_end):
+    output = io.BytesIO()
+    with open(path) as genome:
+        pause_copy_region.main(genomic_region_start=cut_start,
+                               genomic_region_end=cut_end, genome=genome,
+                               output=output)
+    return output.getvalue()
+
+
+if __name__ == "__main__":
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 20000000
+    bases = numpy.frombuffer(b'ACGT', dtype=numpy.uint8)
+    sequence = bases[numpy.random.RandomState(42).randint(0, 4, length)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'genome.fa')
+        with open(path, 'wb') as handle:
+            handle.write(b'>synthetic test genome\n')
+            for start in range(0, length, 70):
+                handle.write(sequence[start:start + 70].tobytes() + b'\n')
+
+        (cut_start, cut_end) = (length // 3, length // 3 + 5000)
+        results = []
+        for name, impl in (('biopython', biopython),
+                           ('streaming', streaming),
+                           ('indexed', streaming)):
+            start = time.time()
+            results.append(impl(path, cut_start, cut_end))
+            print("%-10s %8.4fs" % (name, time.time() - start))
+        assert results[0] == results[1] == results[2], 'outputs differ'
+        print("Outputs match")
+    finally:
+        shutil.rmtree(directory)
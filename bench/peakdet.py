@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""Benchmark cpt_pause.peaks.peakdet against the original loop
+
+Usage:
+    python bench/peakdet.py [length]
+
+Times every implementation, and the original loop it replaced, on a
+synthetic signal of ``length`` bases (default 5 Mb) with delta=40, and on
+coverage-like noise with a peak every few bases (delta=5). That they all
+give the same results is checked by tests/test_peaks.py.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                'tests'))
+import cpt_pause.peaks as peaks  # noqa: E402
+from test_peaks import dense, implementations, peakdet_loop, \
+    synthetic  # noqa: E402
+
+
+if __name__ == "__main__":
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+
+    # Compile the numba kernel outside of the timing
+    peaks.peakdet(synthetic(100), 40)
+    print("%-10s %-10s %10s" % ('signal', 'impl', 'time (s)'))
+    for signal_name, signal, delta in (('sparse', synthetic(length), 40),
+                                       ('dense', dense(length), 5)):
+        for impl_name, impl in [('loop', peakdet_loop)] + implementations():
+            elapsed = min(timeit.repeat(
+                lambda: impl(signal, delta), number=1,
+                repeat=3 if impl_name != 'loop' else 1))
+            print("%-10s %-10s %10.4f" % (signal_name, impl_name, elapsed))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Benchmark cpt_pause.Gfx.plot on a synthetic genome
+
+Usage:
+    python bench/plot.py [length]
+
+Builds the same tracks pause_plotter.py would (two coverage, two starts and
+two highlight tracks) for a synthetic genome of ``length`` bases (default
+5 Mb), then times rendering them to SVG.
+"""
+import os
+import sys
+import time
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import cpt_pause.plot  # noqa: E402
+
+
+def synthetic(length, seed=42):
+    """Per-base coverage and starts for both strands, plus some peaks"""
+    rng = numpy.random.RandomState(seed)
+    positions = numpy.arange(length)
+    tracks = {}
+    for strand, sign in (('f', 1), ('r', -1)):
+        starts = rng.poisson(0.5, length)
+        spikes = rng.randint(0, length, length // 5000)
+        starts[spikes] += rng.randint(20, 200, len(spikes))
+        coverage = numpy.convolve(starts, numpy.ones(150, dtype=int))[:length]
+        tracks['cov_' + strand] = numpy.column_stack(
+            (positions, sign * coverage))
+        tracks['starts_' + strand] = numpy.column_stack(
+            (positions, sign * starts))
+        tracks['max_' + strand] = numpy.column_stack(
+            (spikes, sign * starts[spikes]))
+    return tracks
+
+
+if __name__ == "__main__":
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    tracks = synthetic(length)
+
+    start = time.time()
+    svg = cpt_pause.plot.plot_contig(
+        [tracks['cov_f'], tracks['cov_r']],
+        [tracks['starts_f'], tracks['starts_r']],
+        [tracks['max_f'], tracks['max_r']])
+    print("Plotted %s bases in %.4fs (%s bytes of SVG)" %
+          (length, time.time() - start, len(svg)))
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""Benchmark cpt_pause.Filter.repeat_reduction against the original loop
+
+Usage:
+    python bench/repeat_reduction.py [length]
+
+Times both on a synthetic signal of ``length`` bases (default 5 Mb). That
+they give the same results (bar repeat_reduction also keeping the last
+point) is checked by tests/test_filter.py.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir,
+                                'tests'))
+import cpt_pause  # noqa: E402
+from test_filter import repeat_reduction_loop, synthetic  # noqa: E402
+
+
+if __name__ == "__main__":
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+
+    data = synthetic(length)
+    print("%-10s %10s" % ('impl', 'time (s)'))
+    for impl_name, impl, repeat in (
+            ('loop', repeat_reduction_loop, 1),
+            ('numpy', cpt_pause.Filter.repeat_reduction, 3)):
+        elapsed = min(timeit.repeat(lambda: impl(data), number=1,
+                                    repeat=repeat))
+        print("%-10s %10.4f" % (impl_name, elapsed))
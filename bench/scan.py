@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Benchmark parallel BAM scanning in cpt_pause.bam
+
+Usage:
+    python bench/scan.py [BAM file] [max threads]
+
+Times ``scan`` with 1, 2, 4, ... up to ``max threads`` (default: the number
+of CPUs) worker processes. tests/test_bam.py checks that the tiles combine
+to exactly the single threaded result.
+"""
+import multiprocessing
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import cpt_pause.bam  # noqa: E402
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+
+
+class BamFile(object):
+    """Stands in for the file handle GalaxyGetOpt passes the tools"""
+
+    def __init__(self, name):
+        self.name = name
+
+
+if __name__ == "__main__":
+    bam_file = BamFile(sys.argv[1] if len(sys.argv) > 1 else
+                       os.path.join(EXAMPLE, 'angus.bam'))
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else \
+        multiprocessing.cpu_count()
+
+    print("%-10s %10s" % ('threads', 'time (s)'))
+    threads = 1
+    while threads <= max_threads:
+        elapsed = min(timeit.repeat(
+            lambda: cpt_pause.bam.scan(bam_file, threads=threads),
+            number=1, repeat=3))
+        print("%-10d %10.4f" % (threads, elapsed))
+        threads *= 2
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+"""Compare plotting from (position, value) rows and from compact values
+
+Usage:
+    python bench/track.py [length]
+
+Plots a synthetic genome of ``length`` bases (default 5 Mb) twice: once
+from int64 (position, value) rows, as pause_plotter.py used to load them,
+and once from int16 per-base values. It checks both give the same SVG, then
+reports the time taken and the peak memory allocated by each.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import cpt_pause.io  # noqa: E402
+import cpt_pause.plot  # noqa: E402
+from plot import synthetic  # noqa: E402
+
+
+def measure(build):
+    """Plot the tracks made by ``build``, returning (svg, time, peak bytes)"""
+    start = time.time()
+    svg = cpt_pause.plot.plot_contig(*build())
+    elapsed = time.time() - start
+    # Tracing slows allocation down a lot, so memory is measured separately
+    tracemalloc.start()
+    cpt_pause.plot.plot_contig(*build())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (svg, elapsed, peak)
+
+
+if __name__ == "__main__":
+    length = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    tracks = synthetic(length)
+    # Position 0 and 1 are left empty, as minpass on rows also clears small x
+    for name in ('starts_f', 'starts_r'):
+        tracks[name][:2, 1] = 0
+    values = dict((name, cpt_pause.io.compact(tracks[name][:, 1]))
+                  for name in ('cov_f', 'cov_r', 'starts_f', 'starts_r'))
+    highlights = [tracks['max_f'], tracks['max_r']]
+
+    def rows():
+        return ([tracks['cov_f'], tracks['cov_r']],
+                [tracks['starts_f'], tracks['starts_r']], highlights)
+
+    def compact():
+        return ([values['cov_f'], values['cov_r']],
+                [values['starts_f'], values['starts_r']], highlights)
+
+    results = [('rows', measure(rows), tracks['cov_f'].nbytes),
+               ('compact', measure(compact), values['cov_f'].nbytes)]
+    assert results[0][1][0] == results[1][1][0], 'plots differ'
+    print("%-10s %12s %10s %14s" % ('input', 'track bytes', 'time (s)',
+                                    'peak (bytes)'))
+    for name, (svg, elapsed, peak), nbytes in results:
+        print("%-10s %12d %10.4f %14d" % (name, nbytes, elapsed, peak))
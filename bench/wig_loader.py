@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Benchmark cpt_pause.io.read_wig against the bx.wiggle.Reader row loop
+
+Usage:
+    python bench/wig_loader.py [wig files...]
+
+Defaults to the example wig files. Both loaders must produce identical data.
+Requires bx-python, which PAUSE itself no longer depends on.
+"""
+import os
+import sys
+import timeit
+import numpy
+import bx.wiggle
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+import cpt_pause.io  # noqa: E402
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+
+
+def load_bx(path):
+    data = []
+    with open(path, 'r') as handle:
+        for row in bx.wiggle.Reader(handle):
+            data.append((row[1], row[2]))
+    return numpy.array(data, dtype=int)
+
+
+def load_io(path):
+    with open(path, 'r') as handle:
+        tracks = cpt_pause.io.read_wig(handle)
+    return numpy.concatenate([
+        numpy.column_stack(track) for track in tracks.values()
+    ]).astype(int)
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or [
+        os.path.join(EXAMPLE, 'wig.%s.txt' % name) for name in
+        ('starts.f', 'starts.r', 'coverage.f', 'coverage.r')
+    ]
+    print("%-24s %12s %12s %8s" % ('file', 'bx (s)', 'io (s)', 'speedup'))
+    for path in paths:
+        assert (load_bx(path) == load_io(path)).all(), path
+        bx_time = min(timeit.repeat(lambda: load_bx(path), number=1, repeat=3))
+        io_time = min(timeit.repeat(lambda: load_io(path), number=1, repeat=3))
+        print("%-24s %12.4f %12.4f %7.1fx" % (
+            os.path.basename(path), bx_time, io_time, bx_time / io_time))
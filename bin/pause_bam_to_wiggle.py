@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""Extract read starts and coverage from BAM files to Wig format for PAUSE.
+
+Reads the BAM file once, producing all four wig files which would otherwise
+require running both pause_starts_to_wiggle.py and
+pause_coverage_to_wiggle.py.
+
+Usage:
+    pause_bam_to_wiggle.py <BAM file>
+
+"""
+import cpt_pause.bam
+import cpt_pause.io
+from galaxygetopt.ggo import GalaxyGetOpt as GGO
+
+
+def bam_data(bam_file, starts_f, starts_r, cov_f, cov_r,
+             wig_format='variableStep', threads=1, read_filter=None):
+    pileups = cpt_pause.bam.scan(bam_file, threads=threads,
+                                 read_filter=read_filter)
+    cpt_pause.io.write_pileups(starts_f, bam_file, pileups, 'starts_f', 'f',
+                               wig_format=wig_format)
+    cpt_pause.io.write_pileups(starts_r, bam_file, pileups, 'starts_r', 'r',
+                               wig_format=wig_format)
+    cpt_pause.io.write_pileups(cov_f, bam_file, pileups, 'cov_f', 'f',
+                               wig_format=wig_format)
+    cpt_pause.io.write_pileups(cov_r, bam_file, pileups, 'cov_r', 'r',
+                               wig_format=wig_format)
+
+
+if __name__ == "__main__":
+    opts = GGO(
+        options=[
+            ['bam_file', 'Bam File',
+             {'required': True, 'validate': 'File/Input'}],
+            ['wig_format', 'Wig output format',
+             {'validate': 'Option', 'options': cpt_pause.io.WIG_FORMATS,
+              'default': 'variableStep'}],
+            ['threads', 'Number of worker processes used to read the BAM file',
+             {'validate': 'Int', 'default': 1, 'min': 1}],
+        ] + cpt_pause.bam.FILTER_OPTIONS,
+        outputs=[
+            [
+                'starts_f',
+                '+ strand starts wig data',
+                {
+                    'validate': 'File/Output',
+                    'required': True,
+                    'default': 'wig.starts.f',
+                    'data_format': 'text/plain',
+                    'default_format': 'TXT',
+                }
+            ],
+            [
+                'starts_r',
+                '- strand starts wig data',
+                {
+                    'validate': 'File/Output',
+                    'required': True,
+                    'default': 'wig.starts.r',
+                    'data_format': 'text/plain',
+                    'default_format': 'TXT',
+                }
+            ],
+            [
+                'cov_f',
+                '+ strand coverage wig data',
+                {
+                    'validate': 'File/Output',
+                    'required': True,
+                    'default': 'wig.coverage.f',
+                    'data_format': 'text/plain',
+                    'default_format': 'TXT',
+                }
+            ],
+            [
+                'cov_r',
+                '- strand coverage wig data',
+                {
+                    'validate': 'File/Output',
+                    'required': True,
+                    'default': 'wig.coverage.r',
+                    'data_format': 'text/plain',
+                    'default_format': 'TXT',
+                }
+            ]
+        ],
+        defaults={
+            'appid': 'edu.tamu.cpt.pause2.bam_to_wiggle',
+            'appname': 'PAUSE2 BAM to Starts and Coverage Wiggle',
+            'appvers': '0.1',
+            'appdesc': 'create start and coverage wiggle files in one pass',
+        },
+        tests=[],
+        doc=__doc__
+    )
+    options = opts.params()
+    with cpt_pause.io.output_file(opts, 'starts_f') as starts_f, \
+            cpt_pause.io.output_file(opts, 'starts_r') as starts_r, \
+            cpt_pause.io.output_file(opts, 'cov_f') as cov_f, \
+            cpt_pause.io.output_file(opts, 'cov_r') as cov_r:
+        bam_data(options['bam_file'], starts_f, starts_r, cov_f, cov_r,
+                 wig_format=options['wig_format'],
+                 threads=options['threads'],
+                 read_filter=cpt_pause.bam.read_filter(options))
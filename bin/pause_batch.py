@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+"""Run the complete PAUSE workflow for many samples at once.
+
+The manifest is a tab separated file with one line per sample, giving the
+sample name, its BAM file and its genome (FASTA). Relative paths are taken
+relative to the manifest.
+
+Every sample gets a directory in the output directory containing its
+starts/coverage wigs, PAUSE report, repeat regions, highlights and plots.
+The summary output lists each sample with its peak and region counts and how
+many reads were counted and filtered out, or the error which stopped it.
+
+Usage:
+    pause_batch.py --manifest <manifest> --outdir <directory>
+
+"""
+import cpt_pause.bam
+import cpt_pause.batch
+import cpt_pause.io
+from galaxygetopt.ggo import GalaxyGetOpt as GGO
+
+
+if __name__ == "__main__":
+    opts = GGO(
+        options=[
+            ['manifest', 'Sample manifest (sample, BAM file, genome)',
+             {'required': True, 'validate': 'File/Input'}],
+            ['outdir', 'Directory to write per-sample outputs to',
+             {'validate': 'String', 'default': 'pause_batch'}],
+            ['threads', 'Number of samples processed in parallel',
+             {'validate': 'Int', 'default': 1, 'min': 1}],
+            ['max_pairs', 'Maximum number of peak pairs described in the report (0 for all)',
+             {'validate': 'Int', 'default': 0, 'min': 0}],
+            ['wig_format', 'Wig output format',
+             {'validate': 'Option', 'options': cpt_pause.io.WIG_FORMATS,
+              'default': 'variableStep'}],
+        ] + cpt_pause.bam.FILTER_OPTIONS,
+        outputs=[
+            [
+                'summary',
+                'Batch summary',
+                {
+                    'validate': 'File/Output',
+                    'required': True,
+                    'default': 'pause_summary',
+                    'data_format': 'text/plain',
+                    'default_format': 'TXT',
+                }
+            ]
+        ],
+        defaults={
+            'appid': 'edu.tamu.cpt.pause2.batch',
+            'appname': 'PAUSE2 Batch',
+            'appvers': '0.1',
+            'appdesc': 'run the PAUSE workflow on many samples',
+        },
+        tests=[],
+        doc=__doc__
+    )
+    options = opts.params()
+    samples = cpt_pause.batch.read_manifest(options['manifest'])
+    rows = cpt_pause.batch.run(samples, options['outdir'],
+                               threads=options['threads'],
+                               max_pairs=options['max_pairs'],
+                               wig_format=options['wig_format'],
+                               read_filter=cpt_pause.bam.read_filter(options))
+
+    from galaxygetopt.outputfiles import OutputFiles
+    off = OutputFiles(name='summary', GGO=opts)
+    off.CRR(data=cpt_pause.batch.summary(rows))
@@ -1,34 +1,79 @@
 #!/usr/bin/env python
-"""PAUSE: Plotter
+"""PAUSE: Repeat Adder
+
+Re-open a genome at the start of a repeat region found by PAUSE, and copy
+the region onto the end of it.
 """
-from Bio import SeqIO
-import cpt_pause
+import cpt_pause.fasta
+import cpt_pause.io
 from galaxygetopt.ggo import GalaxyGetOpt as GGO
 
-def main(genomic_region=None, genomic_region_start=None, genomic_region_end=None, genome=None, **kwd):
+def main(genomic_region=None, genomic_region_start=None, genomic_region_end=None, genome=None, output=None, **kwd):
+    """Write the genome, re-opened at the start of the repeat region and with
+    the region copied onto the end, to the (binary) ``output`` handle"""
     cut_start = 0
     cut_end = 0
+    chrom = None
 
     if genomic_region_start is not None and genomic_region_end is not None:
         cut_start = genomic_region_start
         cut_end = genomic_region_end
     elif genomic_region is not None:
-        data = genomic_region.readlines()[1].split('\t')
+        data = genomic_region.readlines()[1].strip().split('\t')
         cut_start = data[0]
         cut_end = data[1]
+        # Region lists from multi-contig analyses name the contig
+        if len(data) > 2:
+            chrom = data[2]
     else:
         raise Exception("Must specify region")
 
     cut_start = int(cut_start)
     cut_end = int(cut_end)
 
-    for record in SeqIO.parse(genome, "fasta") :
-        reassemble = record.seq[cut_start:] + record.seq[0:cut_start] + record.seq[cut_start:cut_end]
+    # The contig containing the repeat is re-opened (the first one, if the
+    # region doesn't say), any others are passed through untouched. Sequence
+    # is streamed from the input to the output, a piece at a time.
+    writer = cpt_pause.fasta.Writer(output)
+    found = False
+    for (header, length, fetch) in _records(genome):
+        writer.record(header)
+        if not found and (chrom is None or
+                          cpt_pause.fasta.record_id(header) == chrom):
+            found = True
+            pieces = ((cut_start, None), (0, cut_start), (cut_start, cut_end))
+        else:
+            pieces = ((0, None),)
+        for (start, end) in pieces:
+            # Bounds behave as they would slicing the sequence
+            (start, end) = slice(start, end).indices(length)[:2]
+            for chunk in fetch(start, end):
+                writer.write(chunk)
+    writer.finish()
+
+    if not found:
+        raise Exception("Could not find %s in genome" % chrom)
 
-        record.seq = reassemble
-        return [record]
 
-    return None
+def _records(genome):
+    """Yield (header, length, fetch) for every sequence in the genome, where
+    ``fetch(start, end)`` gives the bases [start, end) in one or more pieces
+    """
+    try:
+        fasta = cpt_pause.fasta.Fasta(genome.name)
+    except (AttributeError, EnvironmentError, ValueError):
+        # Not a file which can be indexed and mapped, so each sequence has to
+        # be read in whole
+        for (header, sequence) in cpt_pause.fasta.records(genome):
+            yield (header, len(sequence),
+                   lambda start, end, sequence=sequence: [sequence[start:end]])
+        return
+
+    with fasta:
+        for name in fasta.names:
+            yield (fasta.header(name), fasta.entries[name].length,
+                   lambda start, end, name=name: fasta.chunks(name, start,
+                                                              end))
 
 if __name__ == "__main__":
     opts = GGO(
@@ -66,8 +111,6 @@ if __name__ == "__main__":
         doc=__doc__
     )
     options = opts.params()
-    output = main(**options)
-
-    from galaxygetopt.outputfiles import OutputFiles
-    off = OutputFiles(name='repeat_fa', GGO=opts)
-    off.CRR(data=output)
+    with cpt_pause.io.output_file(opts, 'repeat_fa', mode='wb',
+                                  extension='fa') as handle:
+        main(output=handle, **options)
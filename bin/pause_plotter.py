@@ -1,25 +1,38 @@
 #!/usr/bin/env python
 """PAUSE: Plotter
 """
-import bx.wiggle
+from collections import OrderedDict
 import numpy
-import cpt_pause
+import cpt_pause.io
+import cpt_pause.plot
 from galaxygetopt.ggo import GalaxyGetOpt as GGO
 
 
-def get_data(wig_handle, count):
-    data = []
-    for row in bx.wiggle.Reader(wig_handle):
-        data.append((row[1], row[2]))
+def get_data(wig_handle, dense=True):
+    """Load a wig file into one array per chromosome
 
-    reshaped = numpy.array(data, dtype=numpy.int)
-    # Odd rows need to be fixed
-    if count % 2 == 1:
-        reshaped[:, 1] *= -1
-    return reshaped
+    With ``dense``, arrays hold the value of every position from 0 onwards,
+    otherwise they are (position, value) rows. Dense arrays are the cached
+    (read-only) arrays themselves where possible, see
+    ``cpt_pause.io.load_wig``.
+    """
+    data = OrderedDict()
+    for chrom, (positions, values) in \
+            cpt_pause.io.load_wig(wig_handle).items():
+        values = cpt_pause.io.compact(values)
+        if dense:
+            data[chrom] = cpt_pause.io.densify(positions, values)
+        else:
+            data[chrom] = numpy.column_stack((positions, values)).astype(int)
+    return data
 
 
-def main(coverage=None, starts=None, highlights=None):
+def main(coverage=None, starts=None, highlights=None, format='svg'):
+    """Plot every contig found in the input files
+
+    Returns a list of (contig, plot) tuples. Contigs are plotted
+    independently of one another.
+    """
     if coverage is None:
         coverage = []
     if starts is None:
@@ -27,37 +40,36 @@ def main(coverage=None, starts=None, highlights=None):
     if highlights is None:
         highlights = []
 
-    track_list = []
     count = 0
+    loaded = {}
+    for kind, handles in (('coverage', coverage), ('starts', starts),
+                          ('highlights', highlights)):
+        loaded[kind] = []
+        for wig_handle in handles:
+            # Odd files are drawn negated, below the axis
+            sign = -1 if count % 2 == 1 else 1
+            loaded[kind].append(
+                (get_data(wig_handle, dense=kind != 'highlights'), sign))
+            count += 1
 
-    # Coverage is handled separately and "just for looks"
-    for wig_handle in coverage:
-        # Fetch data
-        reshaped = get_data(wig_handle, count)
-        # Downsample
-        reshaped = cpt_pause.Filter.downsample(reshaped, sampling_interval=10)
-        # Append
-        track_list.append(cpt_pause.Coverage(reshaped, opacity=0.5))
-        count += 1
-
-    # Starts are handled separately from coverage
-    for wig_handle in starts:
-        # Fetch data
-        reshaped = get_data(wig_handle, count)
-        # Pass filter, then remove repeated y values
-        reshaped = cpt_pause.Filter.repeat_reduction(
-            cpt_pause.Filter.minpass(reshaped, min_value=2))
-        track_list.append(cpt_pause.Coverage(reshaped, line_color='blue'))
-        count += 1
-
-    for wig_handle in highlights:
-        # Fetch data
-        reshaped = get_data(wig_handle, count)
-        track_list.append(cpt_pause.Highlight(reshaped))
-        count += 1
+    # Contigs in the order they are first seen
+    chroms = []
+    for kind in ('coverage', 'starts', 'highlights'):
+        for (data, sign) in loaded[kind]:
+            chroms.extend(c for c in data if c not in chroms)
 
-    g = cpt_pause.Gfx(track_list)
-    return g.plot()
+    plots = []
+    for chrom in chroms:
+        per_kind = []
+        signs = []
+        for kind in ('coverage', 'starts', 'highlights'):
+            present = [(data, sign) for (data, sign) in loaded[kind]
+                       if chrom in data]
+            per_kind.append([data[chrom] for (data, sign) in present])
+            signs.extend(sign for (data, sign) in present)
+        plots.append((chrom, cpt_pause.plot.plot_contig(
+            *per_kind, format=format, signs=signs)))
+    return plots
 
 
 if __name__ == "__main__":
@@ -69,6 +81,9 @@ if __name__ == "__main__":
              {'multiple': True, 'validate': 'File/Input'}],
             ['highlights', 'Data Highlights',
              {'multiple': True, 'validate': 'File/Input'}],
+            ['format', 'Plot format',
+             {'validate': 'Option', 'options': cpt_pause.plot.PLOT_FORMATS,
+              'default': 'svg'}],
         ],
         outputs=[
             [
@@ -93,9 +108,18 @@ if __name__ == "__main__":
         doc=__doc__
     )
     options = opts.params()
-    output = main(coverage=options['coverage'], starts=options['starts'],
-                  highlights=options['highlights'])
+    plots = main(coverage=options['coverage'], starts=options['starts'],
+                 highlights=options['highlights'], format=options['format'])
 
-    from galaxygetopt.outputfiles import OutputFiles
-    off = OutputFiles(name='pause_plot', GGO=opts)
-    off.CRR(data=output)
+    # PNG data is binary, so can't go through GalaxyGetOpt's text writer
+    if options['format'] == 'png':
+        (mode, extension) = ('wb', 'png')
+    else:
+        (mode, extension) = ('w', 'txt')
+    for idx, (chrom, plot) in enumerate(plots):
+        # Additional contigs become additional outputs
+        filename = None if idx == 0 else 'pause_plot_%s' % chrom
+        with cpt_pause.io.output_file(opts, 'pause_plot', mode=mode,
+                                      extension=extension,
+                                      filename=filename) as handle:
+            handle.write(plot)
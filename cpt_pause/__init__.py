@@ -6,27 +6,75 @@ Library only (for now)
 
 import svgwrite
 import numpy
-import math
+from cpt_pause.raster import Canvas
 
 class Track(object):
-
-    def __init__(self, data):
-        self.data = numpy.array(data)
-        self.dmax = numpy.max(self.data[:, 1])
-        self.dmin = numpy.min(self.data[:, 1])
-        self.amax = numpy.max(numpy.abs(self.data[:, 1]))
-        self.length = numpy.max(data[:, 0])
-        # Invert data for SVG (This is because 0 is top, 1000 is bottom, so
-        # when we add +200 to move downwards, we need to substract X to move
-        # back up)
-        self.data[:, 1] = self.data[:, 1] * -1
+    """Points to plot, given either as (x, y) rows or, for consecutive x
+    values, as just the y values of x = start, start + 1, ...
+
+    The data is kept as given (no copy is made), so a compact dtype such as
+    int16 or float32 stays compact. With ``sign=-1`` the y values are drawn
+    negated (e.g. the reverse strand, below the axis), again without
+    copying the data.
+    """
+
+    def __init__(self, data, start=0, sign=1):
+        data = numpy.asarray(data)
+        self.sign = sign
+        if data.ndim == 1:
+            self.x = None
+            self.y = data
+            self.start = start
+            self.length = start + len(data) - 1
+        else:
+            # Plotting slices rows of the plot out of the data by position
+            if numpy.any(numpy.diff(data[:, 0]) < 0):
+                order = numpy.argsort(data[:, 0], kind='mergesort')
+                data = data[order]
+            self.x = data[:, 0]
+            self.y = data[:, 1]
+            self.length = self.x[-1]
+        (self.dmin, self.dmax) = _extremes(self.y)
+        if sign < 0:
+            (self.dmin, self.dmax) = (-self.dmax, -self.dmin)
+        self.amax = max(abs(self.dmin), abs(self.dmax))
+
+    def span(self, lo, hi):
+        """x and y values of the points with lo <= x <= hi"""
+        if self.x is None:
+            first = max(int(numpy.ceil(lo)) - self.start, 0)
+            last = max(int(numpy.floor(hi)) - self.start + 1, first)
+            y_values = self._signed(self.y[first:last])
+            return (numpy.arange(first, first + len(y_values)) + self.start,
+                    y_values)
+        first = numpy.searchsorted(self.x, lo, side='left')
+        last = numpy.searchsorted(self.x, hi, side='right')
+        return (self.x[first:last], self._signed(self.y[first:last]))
+
+    def _signed(self, y_values):
+        # Only the (small) slice is copied to negate it
+        if self.sign < 0:
+            return -y_values
+        return y_values
+
+
+def _extremes(values, block_size=65536):
+    """(min, max) of values, found in a single pass over the data a cache
+    sized block at a time"""
+    lowest = highest = values[0]
+    for i in range(0, len(values), block_size):
+        block = values[i:i + block_size]
+        lowest = min(lowest, block.min())
+        highest = max(highest, block.max())
+    # Python numbers, so later arithmetic can't overflow a small dtype
+    return (lowest.item(), highest.item())
 
 
 class Coverage(Track):
 
     def __init__(self, data, line_width=1, line_color='black', fill='grey',
-                 opacity=1.0):
-        Track.__init__(self, data)
+                 opacity=1.0, sign=1):
+        Track.__init__(self, data, sign=sign)
         self.style = {
             'line_width': line_width,
             'line_color': line_color,
@@ -34,19 +82,56 @@ class Coverage(Track):
             'opacity': opacity,
         }
 
-    def plot(self, svg, points):
-        return [svg.polygon(points, stroke_width=self.style['line_width'],
-                            stroke=self.style['line_color'],
-                            fill=self.style['fill'],
-                            opacity=self.style['opacity'],
-                            )]
+    def plot(self, svg, x_values, y_values):
+        # A single path, with its data formatted in one go, is far cheaper
+        # than handing svgwrite a polygon of point tuples
+        d = 'M' + _format_points(x_values, y_values) + 'Z'
+        return [svg.path(d=d, stroke_width=self.style['line_width'],
+                         stroke=self.style['line_color'],
+                         fill=self.style['fill'],
+                         opacity=self.style['opacity'],
+                         )]
+
+    def raster(self, canvas, x_values, y_values, axis):
+        """Draw the polygon closed along the axis at y=``axis``, a column of
+        pixels at a time"""
+        columns = numpy.clip(numpy.floor(x_values).astype(int), 0,
+                             canvas.width - 1)
+        first = numpy.flatnonzero(numpy.diff(columns)) + 1
+        starts = numpy.concatenate(([0], first))
+        last = numpy.append(first - 1, len(columns) - 1)
+        present = columns[starts]
+        y_min = numpy.minimum.reduceat(y_values, starts)
+        y_max = numpy.maximum.reduceat(y_values, starts)
+        # The outline enters each column at the value the previous one
+        # ended on
+        entry = numpy.concatenate(([y_values[0]], y_values[last[:-1]]))
+        y_min = numpy.minimum(y_min, entry)
+        y_max = numpy.maximum(y_max, entry)
+
+        # Columns without points of their own carry on with the last value
+        x0 = present[0]
+        group = numpy.zeros(present[-1] - x0 + 1, dtype=int)
+        group[present - x0] = numpy.arange(len(present))
+        group = numpy.maximum.accumulate(group)
+        is_present = numpy.zeros(len(group), dtype=bool)
+        is_present[present - x0] = True
+        carried = y_values[last][group]
+        line_lo = numpy.where(is_present, y_min[group], carried)
+        line_hi = numpy.where(is_present, y_max[group], carried)
+
+        canvas.spans(x0, numpy.minimum(line_lo, axis),
+                     numpy.maximum(line_hi, axis), self.style['fill'],
+                     self.style['opacity'])
+        canvas.spans(x0, line_lo, line_hi, self.style['line_color'],
+                     self.style['opacity'])
 
 
 class Highlight(Track):
 
     def __init__(self, data, line_width=1, line_color='red', fill='none',
-                 opacity=1.0):
-        Track.__init__(self, data)
+                 opacity=1.0, sign=1):
+        Track.__init__(self, data, sign=sign)
         self.style = {
             'line_width': line_width,
             'line_color': line_color,
@@ -54,9 +139,9 @@ class Highlight(Track):
             'opacity': opacity,
         }
 
-    def plot(self, svg, points):
+    def plot(self, svg, x_values, y_values):
         data = []
-        for point in points:
+        for point in zip(x_values, y_values):
             data.append(svg.circle(center=point, r=15,
                                    stroke_width=self.style['line_width'],
                                    stroke=self.style['line_color'],
@@ -65,6 +150,12 @@ class Highlight(Track):
                                    ))
         return data
 
+    def raster(self, canvas, x_values, y_values, axis):
+        for point in zip(x_values, y_values):
+            canvas.circle(point[0], point[1], 15, self.style['line_color'],
+                          line_width=self.style['line_width'],
+                          opacity=self.style['opacity'])
+
 
 class Gfx(object):
 
@@ -79,25 +170,87 @@ class Gfx(object):
     def add_track(self, data):
         self.tracks.append(data)
 
-    def plot(self, width=1000, scale=5):
-        dataset_length = numpy.max([f.length for f in self.tracks])
+    def _scaling(self, width, scale, start, end):
+        if end is None:
+            end = numpy.max([f.length for f in self.tracks])
         dataset_max = numpy.max([f.amax for f in self.tracks])
         # Scale = Number of KB per row
-        number_of_rows = dataset_length / scale / 1000
         points_per_row = scale * 1000
+        number_of_rows = int((end - start) // points_per_row)
         # Scaling Factors
         row_x_scaling_factor = float(width) / float(points_per_row)
         row_y_scaling_factor = float(self.row_height) / float(2 * dataset_max)
-
+        return (number_of_rows, points_per_row, row_x_scaling_factor,
+                row_y_scaling_factor)
+
+    def _row_offset(self, subset_idx):
+        """Y position of the axis of a row"""
+        return (self.row_sep + self.row_height) * subset_idx + \
+            (self.row_height // 2)
+
+    def _kb_marks(self, subset_idx, points_per_row, start):
+        """Positions of the whole kb in a row"""
+        row_start = start + subset_idx * points_per_row
+        first = int(numpy.ceil(row_start / 1000.0)) * 1000
+        return (row_start, range(first, int(row_start + points_per_row), 1000))
+
+    def _rows(self, track, width, scale, start=0, end=None):
+        """Yield (row, x values, y values) of a track's points in each row,
+        in plot coordinates"""
+        (number_of_rows, points_per_row, row_x_scaling_factor,
+         row_y_scaling_factor) = self._scaling(width, scale, start, end)
+        # Rows include the points on both their start and end positions
+        bounds = start + numpy.arange(number_of_rows + 1) * points_per_row
+        for subset_idx in range(number_of_rows):
+            # Subset our data
+            row_start = bounds[subset_idx]
+            row_end = bounds[subset_idx + 1]
+            (x_subset, y_subset) = track.span(row_start, row_end)
+            if not isinstance(track, Highlight):
+                # Nothing narrower than a pixel can be seen, so keep just the
+                # extremes of each pixel column. This bounds the size of the
+                # plot whatever the genome length.
+                keep = Filter.envelope_mask(x_subset, y_subset,
+                                            1 / row_x_scaling_factor,
+                                            origin=start)
+                # Close the polygon along the axis
+                x_subset = numpy.concatenate(([row_start], x_subset[keep],
+                                              [row_end]))
+                y_subset = numpy.concatenate(([0], y_subset[keep], [0]))
+
+            if len(x_subset) > 0:
+                # Offset the data for Y
+                row_y_offset = self._row_offset(subset_idx)
+                # Apply data reshaping. y is inverted for SVG (0 is the top,
+                # so values above the axis are subtracted from its offset)
+                row_y_values = row_y_offset - (y_subset * row_y_scaling_factor)
+                row_x_values = ((x_subset - start) * row_x_scaling_factor) - (subset_idx * width)
+                yield (subset_idx, row_x_values, row_y_values)
+
+    def plot(self, width=1000, scale=5, format='svg', start=0, end=None):
+        """Plot every track, ``scale`` kb per row
+
+        Returns an SVG document, or with ``format='png'`` a PNG image (which
+        has no axis labels). The plot covers positions ``start`` to ``end``
+        (by default, the end of the longest track).
+        """
+        if format == 'png':
+            return self.plot_png(width=width, scale=scale, start=start,
+                                 end=end)
+        (number_of_rows, points_per_row, row_x_scaling_factor,
+         row_y_scaling_factor) = self._scaling(width, scale, start, end)
+
+        # Elements are built from known good values, so svgwrite's
+        # (expensive) validation of every attribute is skipped
         svg = svgwrite.Drawing(size=("%spx" % width,
                                      "%spx" % ((number_of_rows + 2) *
-                                               1.2 * self.row_height)))
+                                               1.2 * self.row_height)),
+                               debug=False)
 
         for subset_idx in range(number_of_rows):
-            row_y_offset = ((self.row_sep + self.row_height) * subset_idx) \
-                + (self.row_height/2)
-            row_y_offset_min = row_y_offset - (self.row_height / 2)
-            row_y_offset_max = row_y_offset + (self.row_height / 2)
+            row_y_offset = self._row_offset(subset_idx)
+            row_y_offset_min = row_y_offset - (self.row_height // 2)
+            row_y_offset_max = row_y_offset + (self.row_height // 2)
             svg.add(svg.rect(
                 insert=(0, row_y_offset_min),
                 size=(width, self.row_height),
@@ -107,8 +260,10 @@ class Gfx(object):
                 fill='none',
             ))
 
-            for kb_mark in range(0, scale):
-                x_offset = kb_mark * 1000 * row_x_scaling_factor
+            (row_start, kb_marks) = self._kb_marks(subset_idx,
+                                                   points_per_row, start)
+            for kb_mark in kb_marks:
+                x_offset = (kb_mark - row_start) * row_x_scaling_factor
                 svg.add(svg.line(
                     start=(x_offset, row_y_offset_min),
                     end=(x_offset, row_y_offset_max),
@@ -117,41 +272,51 @@ class Gfx(object):
                     opacity=0.45,
                 ))
 
-                dist = kb_mark + (subset_idx * scale)
+                dist = kb_mark // 1000
                 svg.add(svg.text('%s kb' % dist,
                                  insert=(x_offset, row_y_offset_max + 18)))
 
         for track in self.tracks:
-            for subset_idx in range(number_of_rows):
-                # Subset our data
-                start = subset_idx * points_per_row
-                end = (1 + subset_idx) * points_per_row
-                subset = []
-                # Only points in this row
-                if not isinstance(track, Highlight):
-                    subset = [(start, 0)]
-                subset += [p for p in track.data if start <= p[0] <= end]
-                if not isinstance(track, Highlight):
-                    subset += [(end, 0)]
-                subset = numpy.array(subset)
-
-                if len(subset) > 0:
-                    x_subset = subset[:, 0]
-                    y_subset = subset[:, 1]
-                    # Offset the data for Y
-                    row_y_offset = (self.row_sep + self.row_height) * subset_idx + (self.row_height/2)
-                    # Apply data reshaping
-                    row_y_values = (y_subset * row_y_scaling_factor) + row_y_offset
-                    row_x_values = (x_subset * row_x_scaling_factor) - (subset_idx * width)
-                    # Restack data into [[], []]
-                    reshaped = numpy.column_stack((row_x_values, row_y_values))
-                    ##http://stackoverflow.com/a/10016379
-                    points = tuple(map(tuple, reshaped))
-                    for dataset in track.plot(svg, points):
-                        svg.add(dataset)
+            for (subset_idx, row_x_values, row_y_values) in \
+                    self._rows(track, width, scale, start, end):
+                for dataset in track.plot(svg, row_x_values, row_y_values):
+                    svg.add(dataset)
 
         return svg.tostring()
 
+    def plot_png(self, width=1000, scale=5, start=0, end=None):
+        """Plot every track to a PNG image, laid out as ``plot`` would"""
+        (number_of_rows, points_per_row, row_x_scaling_factor,
+         row_y_scaling_factor) = self._scaling(width, scale, start, end)
+        canvas = Canvas(width, (number_of_rows + 2) * 1.2 * self.row_height)
+
+        for subset_idx in range(number_of_rows):
+            row_y_offset = self._row_offset(subset_idx)
+            row_y_offset_min = row_y_offset - (self.row_height // 2)
+            row_y_offset_max = row_y_offset + (self.row_height // 2)
+            canvas.rect(0, row_y_offset_min, width, self.row_height, 'gray',
+                        opacity=0.45)
+            (row_start, kb_marks) = self._kb_marks(subset_idx,
+                                                   points_per_row, start)
+            for kb_mark in kb_marks:
+                x_offset = (kb_mark - row_start) * row_x_scaling_factor
+                canvas.vline(x_offset, row_y_offset_min, row_y_offset_max,
+                             'gray', opacity=0.45)
+
+        for track in self.tracks:
+            for (subset_idx, row_x_values, row_y_values) in \
+                    self._rows(track, width, scale, start, end):
+                track.raster(canvas, row_x_values, row_y_values,
+                             self._row_offset(subset_idx))
+
+        return canvas.png()
+
+
+def _format_points(x_values, y_values):
+    """Format coordinates as an SVG point list, ``"x,y x,y ..."``"""
+    coords = numpy.column_stack((x_values, y_values)).ravel().tolist()
+    return ('%.1f,%.1f ' * len(x_values) % tuple(coords)).rstrip()
+
 
 class Filter(object):
 
@@ -181,45 +346,56 @@ class Filter(object):
             note the missing range of zeros, but the bounding zeros left in.
             Should not be specific to 0.
         """
-        fixed = []
-        # start out with first element
-        fixed.append(data[0])
-        # Last thing we added was y value
-        #last_added = data[0][1]
-        for i in range(1, len(data)-1):
-            prev = data[i-1][1]
-            curr = data[i][1]
-            nexe = data[i+1][1]
-            # If the value is the same as the previos and the next, we ignore it completely
-            if prev == curr and curr == nexe:
-                pass
-            # Otherwise, we add it to the stack
-            else:
-                fixed.append(data[i])
-        return numpy.array(fixed)
+        data = numpy.asarray(data)
+        # data may also be just the y values, of x = 0, 1, ...
+        y_vals = data if data.ndim == 1 else data[:, 1]
+        # Keep a point unless it matches the values on both sides of it
+        keep = numpy.ones(len(data), dtype=bool)
+        keep[1:-1] = (y_vals[1:-1] != y_vals[:-2]) | \
+            (y_vals[1:-1] != y_vals[2:])
+        if data.ndim == 1:
+            x_vals = numpy.flatnonzero(keep)
+            return numpy.column_stack((x_vals, y_vals[x_vals]))
+        if len(data) < 3:
+            return numpy.array(data)
+        return data[keep]
+
+    @classmethod
+    def envelope(cls, data, bin_size, origin=0):
+        """
+            Reduce data to the envelope of every bin of bin_size x values
+            (e.g. the bases covered by one pixel), keeping at most four
+            points per bin: the first, the last, and the first to reach the
+            bin's minimum and maximum. Unlike averaging each bin, narrow
+            spikes survive, and lines between bins are unchanged. Bins start
+            at x = origin.
+        """
+        if len(data) == 0:
+            return data
+        return data[cls.envelope_mask(data[:, 0], data[:, 1], bin_size,
+                                      origin=origin)]
 
     @classmethod
-    def downsample(cls, data, sampling_interval=10):
+    def envelope_mask(cls, x_vals, y_vals, bin_size, origin=0):
         """
-            Downsample data at a specified interval
+            Boolean mask of the points envelope keeps, for separate x and y
+            arrays
         """
-        x_vals = data[:, 0]
-        y_vals = data[:, 1]
-
-        pad_size = math.ceil(float(y_vals.size) / sampling_interval) * \
-            sampling_interval - y_vals.size
-        padded = numpy.append(y_vals, numpy.zeros(pad_size) * numpy.NaN)
-        y_vals_fixed = numpy.nanmean(padded.reshape(-1, sampling_interval),
-                                     axis=1)
-
-        pad_size = math.ceil(float(x_vals.size) / sampling_interval) * \
-            sampling_interval - x_vals.size
-        padded = numpy.append(x_vals, numpy.zeros(pad_size) * numpy.NaN)
-        x_vals_fixed = numpy.nanmean(padded.reshape(-1, sampling_interval),
-                                     axis=1)
-
-        result = numpy.column_stack((x_vals_fixed, y_vals_fixed))
-        return numpy.array(result, dtype=numpy.int)
+        keep = numpy.zeros(len(x_vals), dtype=bool)
+        if len(x_vals) == 0:
+            return keep
+        bins = numpy.floor((x_vals - origin) / float(bin_size))
+        starts = numpy.concatenate(([0], numpy.flatnonzero(numpy.diff(bins)) + 1))
+        counts = numpy.diff(numpy.append(starts, len(x_vals)))
+        index = numpy.arange(len(x_vals))
+        keep[starts] = True
+        keep[starts + counts - 1] = True
+        for reduction in (numpy.minimum, numpy.maximum):
+            extreme = numpy.repeat(reduction.reduceat(y_vals, starts), counts)
+            # First point in each bin reaching the bin's extreme
+            hits = numpy.where(y_vals == extreme, index, len(x_vals))
+            keep[numpy.minimum.reduceat(hits, starts)] = True
+        return keep
 
     @classmethod
     def minpass(cls, data, min_value=5):
@@ -0,0 +1,71 @@
+"""PAUSE analysis of a single contig
+
+Each contig is analysed independently of every other, so contigs may be
+processed in any order, or in parallel.
+"""
+from cpt_pause.peaks import peakdet
+from cpt_pause.regions import identify_regions, per_base
+
+
+class ContigAnalysis(object):
+    """Results of analysing one contig
+
+    ``max_f``/``max_r`` are the peaks called on each strand, ``report`` the
+    lines of the PAUSE report and ``regions`` the [start, end] of every
+    likely repeat region.
+    """
+
+    def __init__(self, chrom, length, max_f, max_r, report, regions):
+        self.chrom = chrom
+        self.length = length
+        self.max_f = max_f
+        self.max_r = max_r
+        self.report = report
+        self.regions = regions
+
+
+def analyse_contig(chrom, starts_f, starts_r, cov_f, cov_r, length,
+                   delta=40, max_pairs=None, titled=False):
+    """Call peaks in the start data and look for repeat regions
+
+    Data is passed as per-base arrays, or (position, value) arrays with one
+    row per base. If
+    ``titled`` is set, the report is headed with the contig name, which is
+    useful when reports for several contigs are combined.
+    """
+    (max_f, min_f) = peakdet(per_base(starts_f), delta)
+    (max_r, min_r) = peakdet(per_base(starts_r), delta)
+    (report, regions) = identify_regions(
+        max_f, max_r, starts_f, starts_r, cov_f, cov_r, length,
+        max_pairs=max_pairs, chrom=chrom if titled else None)
+    return ContigAnalysis(chrom, length, max_f, max_r, report, regions)
+
+
+def report(results):
+    """Combined PAUSE report for a list of ContigAnalysis"""
+    lines = []
+    for result in results:
+        lines.extend(result.report)
+    return '\n'.join(lines)
+
+
+def region_list(results):
+    """Tab separated list of the repeat regions found in every contig"""
+    # 2D table into tsv
+    lines = ['#start\tend\tchrom']
+    for result in results:
+        for r in result.regions:
+            lines.append('\t'.join([str(int(x)) for x in r] + [result.chrom]))
+    return '\n'.join(lines)
+
+
+def highlights(results, strand):
+    """Wig track of the peaks called on one strand (``f`` or ``r``)"""
+    header = """track type=wiggle_0 name=%s visibility=full
+variableStep chrom=%s\n"""
+    data = ''
+    for result in results:
+        data += header % ('highlights_' + strand, result.chrom)
+        for row in getattr(result, 'max_' + strand):
+            data += ' '.join(map(str, row)) + "\n"
+    return data
@@ -0,0 +1,437 @@
+"""PAUSE BAM scanner
+
+Reads an indexed BAM file once and collects everything the wiggle tools need
+(read starts and coverage, for both strands) in a single pass.
+
+All BAM access goes through ``open_bam``, which builds a missing index (at
+most once, see ``build_index``) and hands out readers which are kept open
+for reuse by later steps in the same process.
+"""
+import array
+import atexit
+import hashlib
+import multiprocessing
+import os
+import stat
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy
+import pysam
+import cpt_pause.io
+
+# Bounds on the size of the Tiles scanned by each worker process, and the
+# number of tiles aimed for per worker
+TILE_SIZE = 1000000
+MIN_TILE_SIZE = 10000
+TILES_PER_WORKER = 4
+
+# Reads with any of these flags set are ignored by default: unmapped (0x4),
+# secondary (0x100) and supplementary (0x800) alignments
+EXCLUDE_FLAGS = 0x904
+# Flag of PCR and optical duplicates
+DUPLICATE_FLAG = 0x400
+# Number of reads a Pileup buffers before adding them to its arrays
+FLUSH_READS = 1 << 20
+# Read counters kept by every Pileup: reads seen, and those ignored for each
+# reason (see ReadFilter)
+COUNTERS = ('reads', 'flag_filtered', 'duplicates', 'low_mapq')
+
+# Command line options setting up a ReadFilter, see read_filter
+FILTER_OPTIONS = [
+    ['min_mapq', 'Ignore reads with a lower mapping quality',
+     {'validate': 'Int', 'default': 0, 'min': 0}],
+    ['exclude_flags', 'Ignore reads with any of these SAM flag bits set '
+     '(default 2308: unmapped, secondary and supplementary alignments)',
+     {'validate': 'Int', 'default': EXCLUDE_FLAGS, 'min': 0}],
+    ['skip_duplicates', 'Ignore reads flagged as PCR or optical duplicates',
+     {'validate': 'Flag'}],
+]
+
+# Open readers, by (process, BAM file, modification time), see open_bam
+_READERS = {}
+# (references, lengths) of every BAM file seen, by (file, modification time)
+_HEADERS = {}
+
+
+def _key(bam_path):
+    path = os.path.abspath(bam_path)
+    return (path, os.path.getmtime(path))
+
+
+def _index_dir():
+    """Directory for the indexes of BAM files which can't be indexed in
+    place, private to the current user (None if it can't be had)"""
+    directory = os.path.join(tempfile.gettempdir(),
+                             'pause-%d' % os.getuid())
+    try:
+        os.mkdir(directory, 0o700)
+    except OSError:
+        pass
+    try:
+        info = os.lstat(directory)
+    except OSError:
+        return None
+    # Anyone can create the directory first, it is only used if it really
+    # is ours alone
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or \
+            info.st_mode & 0o077:
+        return None
+    return directory
+
+
+def build_index(bam_path):
+    """Make sure a BAM file has an up to date index, returning its path
+
+    The index is normally ``<BAM file>.bai``, or if the BAM file's directory
+    isn't writable, a file in a private directory of the current user's
+    under the temporary directory. That file is named for the BAM file's
+    path, size and modification time, so it can't be mistaken for the index
+    of a since changed file. A new index is written under a temporary name
+    and renamed into place, so concurrent jobs never see a partial index (at
+    worst, two of them both build it).
+    """
+    (path, mtime) = _key(bam_path)
+    candidates = [path + '.bai']
+    index_dir = _index_dir()
+    if index_dir is not None:
+        name = '%s\t%d\t%r' % (path, os.path.getsize(path), mtime)
+        candidates.append(os.path.join(index_dir, 'pause_%s.bai' % (
+            hashlib.md5(name.encode('utf-8')).hexdigest())))
+    for index_path in candidates:
+        if os.path.exists(index_path) and \
+                os.path.getmtime(index_path) >= mtime:
+            return index_path
+
+    error = None
+    for index_path in candidates:
+        try:
+            with cpt_pause.io.atomic_path(index_path) as tmp_path:
+                pysam.index(path, tmp_path)
+            return index_path
+        except (pysam.SamtoolsError, IOError, OSError) as e:
+            error = e
+    raise Exception("Could not index %s: %s" % (bam_path, error))
+
+
+def open_bam(bam_path):
+    """Shared reader of an indexed BAM file
+
+    Readers stay open, and are handed out again to later callers in the same
+    process, until ``close_all``. Callers must not close them. A reader of a
+    file which has since been rewritten is closed when the new file is
+    opened.
+    """
+    key = (os.getpid(),) + _key(bam_path)
+    if key not in _READERS:
+        for old in list(_READERS):
+            if old[:2] == key[:2]:
+                _READERS.pop(old).close()
+        index_path = build_index(bam_path)
+        _READERS[key] = pysam.AlignmentFile(key[1], "rb",
+                                            index_filename=index_path)
+    return _READERS[key]
+
+
+@atexit.register
+def close_all():
+    """Close every reader opened by this process"""
+    for key in list(_READERS):
+        if key[0] == os.getpid():
+            _READERS.pop(key).close()
+
+
+@contextmanager
+def indexed_bam(bam_file):
+    """Shared reader of an (open) BAM file, see ``open_bam``"""
+    yield open_bam(bam_file.name)
+
+
+def header(bam_path):
+    """(references, lengths) of a BAM file, read once and then cached
+
+    Only the header is read, the file need not be indexed.
+    """
+    key = _key(bam_path)
+    if key not in _HEADERS:
+        reader = _READERS.get((os.getpid(),) + key)
+        if reader is None:
+            with pysam.AlignmentFile(key[0], "rb", check_sq=False) as reader:
+                _HEADERS[key] = _read_header(reader)
+        else:
+            _HEADERS[key] = _read_header(reader)
+    return _HEADERS[key]
+
+
+def _read_header(reader):
+    return (tuple(reader.references), tuple(reader.lengths))
+
+
+def reference_lengths(bam_path):
+    """Length of every reference in a BAM file's header, by name"""
+    (references, lengths) = header(bam_path)
+    return OrderedDict(zip(references, lengths))
+
+
+class ReadFilter(object):
+    """Decides which reads are counted
+
+    Reads are judged on their flag and mapping quality alone, before any
+    work is done on their alignment.
+    """
+
+    def __init__(self, min_mapq=0, exclude_flags=EXCLUDE_FLAGS,
+                 skip_duplicates=False):
+        self.min_mapq = min_mapq
+        self.exclude_flags = exclude_flags
+        self.skip_duplicates = skip_duplicates
+
+    def reject(self, read):
+        """Counter to record a read against if it is ignored, else None"""
+        flag = read.flag
+        if flag & self.exclude_flags:
+            return 'flag_filtered'
+        if self.skip_duplicates and flag & DUPLICATE_FLAG:
+            return 'duplicates'
+        if self.min_mapq and read.mapq < self.min_mapq:
+            return 'low_mapq'
+        return None
+
+    def __str__(self):
+        return 'min_mapq=%d exclude_flags=0x%x skip_duplicates=%d' % (
+            self.min_mapq, self.exclude_flags, self.skip_duplicates)
+
+
+def read_filter(options):
+    """ReadFilter set up by the FILTER_OPTIONS of a tool"""
+    return ReadFilter(min_mapq=options['min_mapq'],
+                      exclude_flags=options['exclude_flags'],
+                      skip_duplicates=bool(options['skip_duplicates']))
+
+
+class Pileup(object):
+    """Per-base start and coverage counts for a single reference
+
+    All four arrays are indexed such that ``array[i]`` is the value reported
+    at wig position ``offset + i + 1``. ``offset`` is only non-zero for a
+    Pileup covering one tile of a reference, see ``scan_tiles``.
+
+    Coverage has always been reported against 0-based coordinates (i.e. wig
+    position ``i + 1`` holds the number of reads covering 0-based base
+    ``i + 1``), this is kept so results remain comparable with older runs.
+    Only the aligned blocks of a read count as covered, bases deleted from
+    or skipped over (``D``/``N`` in the CIGAR) by the read do not.
+
+    ``add`` records reads in a buffer, which is added to the arrays every
+    FLUSH_READS reads, so memory use is bounded by the length of the
+    reference rather than by the number of reads. ``finalize`` adds the last
+    of them once all reads have been seen. Reads rejected by the
+    ``read_filter`` are left out, ``counts`` keeps track of them (see
+    COUNTERS).
+    """
+
+    def __init__(self, chrom, length, offset=0, read_filter=None):
+        self.chrom = chrom
+        self.length = length
+        self.offset = offset
+        self.read_filter = read_filter or ReadFilter()
+        self.counts = OrderedDict((name, 0) for name in COUNTERS)
+        self.starts_f = numpy.zeros(length, dtype=numpy.int32)
+        self.starts_r = numpy.zeros(length, dtype=numpy.int32)
+        self.cov_f = numpy.zeros(length, dtype=numpy.int32)
+        self.cov_r = numpy.zeros(length, dtype=numpy.int32)
+        self._reset()
+
+    def _reset(self):
+        # Start of every read added since the last flush, and (start, end)
+        # of each of their aligned blocks, per strand
+        self._buffered = 0
+        self._starts_f = array.array('l')
+        self._starts_r = array.array('l')
+        self._blocks_f = (array.array('l'), array.array('l'))
+        self._blocks_r = (array.array('l'), array.array('l'))
+
+    def add(self, read):
+        """Record a single aligned read"""
+        reason = self.read_filter.reject(read)
+        pos = read.pos
+        # A read crossing from one tile into the next is seen by both, but
+        # only counted by the one it starts in
+        if 0 <= pos - self.offset < self.length:
+            self.counts['reads'] += 1
+            if reason is not None:
+                self.counts[reason] += 1
+        if reason is not None:
+            return
+        # Reads without an alignment end (e.g. unmapped mates placed next to
+        # their partner) cover nothing, so they can't contribute a start
+        # either
+        aend = read.aend
+        if aend is None:
+            return
+        if read.is_reverse:
+            self._starts_r.append(aend - 1)
+            blocks = self._blocks_r
+        else:
+            self._starts_f.append(pos)
+            blocks = self._blocks_f
+        for (block_start, block_end) in read.get_blocks():
+            blocks[0].append(block_start)
+            blocks[1].append(block_end)
+        self._buffered += 1
+        if self._buffered >= FLUSH_READS:
+            self.flush()
+
+    def comment(self):
+        """Wig comment line recording the read counters and filter"""
+        return '# chrom=%s %s %s\n' % (
+            self.chrom,
+            ' '.join('%s=%d' % item for item in self.counts.items()),
+            self.read_filter)
+
+    def finalize(self):
+        """Add the reads still buffered, once all reads have been seen"""
+        self.flush()
+
+    def flush(self):
+        """Add the buffered reads to the start and coverage arrays
+
+        Reads may extend beyond the Pileup: a start is only counted if it
+        falls inside, and coverage is clipped to it.
+        """
+        #   qstart   qend   rlen   aend    alen   pos
+        #   0        145    145    13537   143    13394
+        # reverse strand
+        # start is  13395
+        # end is 13537
+        for starts, cov, read_starts, blocks in (
+                (self.starts_f, self.cov_f, self._starts_f, self._blocks_f),
+                (self.starts_r, self.cov_r, self._starts_r, self._blocks_r)):
+            start = numpy.array(read_starts, dtype=numpy.int64) - self.offset
+            start = start[(start >= 0) & (start < self.length)]
+            starts += self._bincount(start, self.length)
+            # Coverage via a difference array, +1 where an aligned block
+            # starts and -1 where it stops. The blocks either side of an
+            # insertion touch, so their -1 and +1 cancel out.
+            block_start = numpy.array(blocks[0], dtype=numpy.int64) - \
+                self.offset
+            block_end = numpy.array(blocks[1], dtype=numpy.int64) - \
+                self.offset
+            diff = self._bincount(
+                numpy.clip(block_start - 1, 0, self.length), self.length + 1)
+            diff -= self._bincount(
+                numpy.clip(block_end - 1, 0, self.length), self.length + 1)
+            cov += numpy.cumsum(diff[:-1]).astype(cov.dtype)
+        self._reset()
+
+    @classmethod
+    def _bincount(cls, idx, length):
+        return numpy.bincount(idx, minlength=length)[:length]
+
+
+class Tile(object):
+    """A [start, end) window of a single reference"""
+
+    def __init__(self, chrom, start, end):
+        self.chrom = chrom
+        self.start = start
+        self.end = end
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return 'Tile(%r, %r, %r)' % (self.chrom, self.start, self.end)
+
+
+def tile_size(lengths, workers, max_size=TILE_SIZE, min_size=MIN_TILE_SIZE):
+    """Choose a tile size giving every worker several tiles to process
+
+    Having more tiles than workers lets the pool balance the load when tiles
+    take different amounts of time (e.g. due to uneven read depth).
+    """
+    per_worker = sum(lengths) // (workers * TILES_PER_WORKER) + 1
+    return max(min_size, min(max_size, per_worker))
+
+
+def tiles(references, lengths, size):
+    """Split every reference into Tiles of (at most) ``size`` bases
+
+    Tiles are returned longest first, so the short tiles at the end of each
+    reference are left to fill in gaps at the end of a parallel run.
+    """
+    found = []
+    for chrom, length in zip(references, lengths):
+        for start in range(0, length, size):
+            found.append(Tile(chrom, start, min(start + size, length)))
+    found.sort(key=len, reverse=True)
+    return found
+
+
+def scan_tiles(bam_path, tile_list, workers, read_filter=None):
+    """Scan Tiles of a BAM file in a pool of worker processes
+
+    Yields a finalized Pileup for every tile, in the order they complete.
+    Every worker opens its own handle on the (indexed) BAM file, and keeps it
+    for all the tiles it scans. Reads
+    crossing the edge of a tile are seen by both neighbours, but each read
+    start is only counted by the tile it falls in, and coverage is clipped to
+    the tile, so the tiles combine to exactly the whole-reference result.
+    """
+    jobs = [(bam_path, tile.chrom, tile.start, tile.end, read_filter)
+            for tile in tile_list]
+    pool = multiprocessing.Pool(workers)
+    try:
+        for pileup in pool.imap_unordered(_scan_tile, jobs):
+            yield pileup
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _scan_tile(job):
+    (bam_path, chrom, start, end, read_filter) = job
+    pileup = Pileup(chrom, end - start, offset=start, read_filter=read_filter)
+    # Coverage at the last base of the tile comes from reads starting one
+    # base later, see Pileup
+    for read in open_bam(bam_path).fetch(chrom, start, end + 1):
+        pileup.add(read)
+    pileup.finalize()
+    return pileup
+
+
+def scan(bam_file, threads=1, read_filter=None):
+    """Scan every reference in a BAM file, returning a list of Pileups
+
+    Each alignment is decoded exactly once, and counted towards both the
+    start and coverage arrays of its strand. Reads are filtered by
+    ``read_filter`` (by default, a ReadFilter with its default settings).
+
+    With more than one thread, references are split into Tiles which are
+    scanned by a pool of worker processes.
+    """
+    (references, lengths) = header(bam_file.name)
+    pileups = [Pileup(chrom, length, read_filter=read_filter)
+               for chrom, length in zip(references, lengths)]
+    if threads <= 1:
+        with indexed_bam(bam_file) as work_bam:
+            for pileup in pileups:
+                for read in work_bam.fetch(pileup.chrom, 0, pileup.length):
+                    pileup.add(read)
+                pileup.finalize()
+        return pileups
+
+    # Workers need the index, build it before they start
+    build_index(bam_file.name)
+
+    by_chrom = dict((pileup.chrom, pileup) for pileup in pileups)
+    tile_list = tiles(references, lengths, tile_size(lengths, threads))
+    for part in scan_tiles(bam_file.name, tile_list, threads,
+                           read_filter=read_filter):
+        whole = by_chrom[part.chrom]
+        section = slice(part.offset, part.offset + part.length)
+        for attr in ('starts_f', 'starts_r', 'cov_f', 'cov_r'):
+            getattr(whole, attr)[section] = getattr(part, attr)
+        for name in COUNTERS:
+            whole.counts[name] += part.counts[name]
+    return pileups
@@ -0,0 +1,122 @@
+"""PAUSE batch processing
+
+Runs the whole PAUSE workflow (starts, coverage, analysis and plots) for
+many samples from within a single process pool, so Python and its
+libraries are only loaded once per worker rather than once per tool per
+sample.
+"""
+from __future__ import absolute_import
+import multiprocessing
+import os
+import cpt_pause.bam
+import cpt_pause.pipeline
+
+SUMMARY_COLUMNS = ('sample', 'status', 'contigs', 'bases', 'peaks_f',
+                   'peaks_r', 'regions') + cpt_pause.bam.COUNTERS
+
+
+class Sample(object):
+    """One line of a batch manifest"""
+
+    def __init__(self, name, bam, genome):
+        self.name = name
+        self.bam = bam
+        self.genome = genome
+
+
+def read_manifest(handle):
+    """Parse a tab separated manifest of sample name, BAM file and FASTA file
+
+    Blank lines and lines starting with ``#`` are ignored. Relative paths are
+    taken relative to the manifest itself.
+    """
+    base = os.path.dirname(getattr(handle, 'name', ''))
+    samples = []
+    for line in handle:
+        if not line.strip() or line.startswith('#'):
+            continue
+        fields = line.rstrip('\r\n').split('\t')
+        if len(fields) != 3:
+            raise Exception("Expected sample, BAM and FASTA in manifest line "
+                            "'%s'" % line.strip())
+        (name, bam, genome) = fields
+        if name in [s.name for s in samples]:
+            raise Exception("Sample %s is listed more than once" % name)
+        samples.append(Sample(name, os.path.join(base, bam),
+                              os.path.join(base, genome)))
+    return samples
+
+
+def run(samples, outdir, threads=1, max_pairs=0, wig_format='variableStep',
+        read_filter=None):
+    """Process every sample, writing outputs under ``outdir/<sample name>``
+
+    Returns one summary row per sample, in the order given. A sample which
+    fails is reported in its row rather than stopping the batch.
+    """
+    jobs = [(sample, os.path.join(outdir, sample.name), max_pairs,
+             wig_format, read_filter) for sample in samples]
+    if threads <= 1:
+        return [_run_job(job) for job in jobs]
+
+    pool = multiprocessing.Pool(threads)
+    try:
+        return pool.map(_run_job, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _run_job(job):
+    (sample, directory, max_pairs, wig_format, read_filter) = job
+    try:
+        result = run_sample(sample, directory, max_pairs=max_pairs,
+                            wig_format=wig_format, read_filter=read_filter)
+    except Exception as e:
+        return [sample.name, 'error: %s' % e] + \
+            [''] * (len(SUMMARY_COLUMNS) - 2)
+    finally:
+        # A worker may go on to process many more samples
+        cpt_pause.bam.close_all()
+    analyses = result.analyses
+    return [sample.name, 'ok', len(analyses),
+            sum(analysis.length for analysis in analyses),
+            sum(len(analysis.max_f) for analysis in analyses),
+            sum(len(analysis.max_r) for analysis in analyses),
+            sum(len(analysis.regions) for analysis in analyses)] + \
+        [sum(pileup.counts[name] for pileup in result.pileups)
+         for name in cpt_pause.bam.COUNTERS]
+
+
+def run_sample(sample, directory, max_pairs=0, wig_format='variableStep',
+               read_filter=None):
+    """Run the PAUSE workflow on one sample, writing outputs to ``directory``
+
+    Outputs are named as in the example Makefile. Returns the pipeline's
+    Result.
+    """
+    result = cpt_pause.pipeline.run(sample.bam, sample.genome,
+                                    max_pairs=max_pairs, wig_dir=directory,
+                                    wig_format=wig_format,
+                                    read_filter=read_filter)
+
+    for name, data in (('wig.pause.f.txt', result.highlights('f')),
+                       ('wig.pause.r.txt', result.highlights('r')),
+                       ('pause_report.txt', result.report),
+                       ('pause_repeat_regions.txt', result.region_list)):
+        with open(os.path.join(directory, name), 'w') as handle:
+            handle.write(data)
+
+    for idx, (pileup, plot) in enumerate(zip(result.pileups, result.plots)):
+        name = 'pause.svg' if idx == 0 else 'pause_plot_%s.svg' % pileup.chrom
+        with open(os.path.join(directory, name), 'w') as handle:
+            handle.write(plot)
+    return result
+
+
+def summary(rows):
+    """Tab separated summary table for the rows returned by ``run``"""
+    lines = ['#' + '\t'.join(SUMMARY_COLUMNS)]
+    for row in rows:
+        lines.append('\t'.join(str(x) for x in row))
+    return '\n'.join(lines) + '\n'
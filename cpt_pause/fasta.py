@@ -0,0 +1,264 @@
+"""PAUSE FASTA access
+
+Reads sequences straight out of (memory mapped) FASTA files using a
+samtools style ``.fai`` index, so pieces of a large assembly can be copied
+without parsing the whole file into sequence objects.
+"""
+from __future__ import absolute_import
+import mmap
+import os
+from collections import OrderedDict
+import cpt_pause.io
+
+# Number of bases copied at a time when streaming a region
+CHUNK_SIZE = 1 << 20
+# Bases per line of FASTA written out (as Biopython writes them)
+LINE_WIDTH = 60
+
+
+class FaiEntry(object):
+    """Location of one sequence in a FASTA file, as listed in a ``.fai``"""
+
+    def __init__(self, name, length, offset, line_bases, line_width):
+        self.name = name
+        self.length = length
+        self.offset = offset
+        self.line_bases = line_bases
+        self.line_width = line_width
+
+    def byte(self, position):
+        """File offset of (0-based) base ``position``"""
+        if self.line_bases == 0:
+            return self.offset
+        return self.offset + (position // self.line_bases) * \
+            self.line_width + position % self.line_bases
+
+
+def read_fai(handle):
+    """Parse a ``.fai`` index into an OrderedDict of name to FaiEntry"""
+    entries = OrderedDict()
+    for line in handle:
+        if not line.strip():
+            continue
+        fields = line.rstrip('\r\n').split('\t')
+        entries[fields[0]] = FaiEntry(fields[0], *[int(x) for x in
+                                                   fields[1:5]])
+    return entries
+
+
+def write_fai(handle, entries):
+    for entry in entries.values():
+        handle.write('%s\t%d\t%d\t%d\t%d\n' % (
+            entry.name, entry.length, entry.offset, entry.line_bases,
+            entry.line_width))
+
+
+def build_fai(path):
+    """Index a FASTA file, reading it once line by line
+
+    Raises ValueError if the file can't be indexed, i.e. a sequence's lines
+    aren't all the same length (bar the last).
+    """
+    entries = OrderedDict()
+    entry = None
+    # Set once a sequence has had a line shorter than the ones before it
+    ended = False
+    # Size of a complete line of the current sequence, once known
+    full = -1
+    offset = 0
+    with open(path, 'rb') as handle:
+        for line in handle:
+            offset += len(line)
+            # Nearly every line is a complete line of sequence
+            if len(line) == full and not ended and line[:1] != b'>':
+                entry.length += entry.line_bases
+                continue
+            if line.startswith(b'>'):
+                name = record_id(line[1:])
+                if name in entries:
+                    raise ValueError("Sequence %s is listed more than once "
+                                     "in %s" % (name, path))
+                entry = FaiEntry(name, 0, offset, 0, 0)
+                entries[name] = entry
+                ended = False
+                full = -1
+                continue
+            if entry is None:
+                if line.strip():
+                    raise ValueError("%s does not start with a FASTA "
+                                     "header" % path)
+                continue
+            bases = len(line.rstrip(b'\r\n'))
+            if entry.line_width == 0:
+                # The first line sets the layout of the rest
+                entry.line_bases = bases
+                entry.line_width = full = len(line)
+            elif (ended and bases) or bases > entry.line_bases or \
+                    (bases == entry.line_bases and line.endswith(b'\n') and
+                     len(line) != entry.line_width):
+                raise ValueError("Lines of %s in %s differ in length" %
+                                 (entry.name, path))
+            # Only the last line of a sequence may be short
+            if bases < entry.line_bases or bases == 0:
+                ended = True
+            entry.length += bases
+    return entries
+
+
+def index(path):
+    """FaiEntry of every sequence in a FASTA file, by name
+
+    An existing ``.fai`` next to the file is used if it is up to date,
+    otherwise one is built and (where the directory is writable) saved for
+    next time.
+    """
+    fai_path = path + '.fai'
+    if os.path.exists(fai_path) and \
+            os.path.getmtime(fai_path) >= os.path.getmtime(path):
+        with open(fai_path) as handle:
+            return read_fai(handle)
+
+    entries = build_fai(path)
+    try:
+        with cpt_pause.io.atomic_path(fai_path) as tmp_path:
+            with open(tmp_path, 'w') as handle:
+                write_fai(handle, entries)
+    except (IOError, OSError):
+        pass
+    return entries
+
+
+class Fasta(object):
+    """Indexed, memory mapped FASTA file
+
+    Sequence is read directly from the mapping, so only the bases asked for
+    are ever copied into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = index(path)
+        self._handle = open(path, 'rb')
+        self._map = mmap.mmap(self._handle.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+
+    def close(self):
+        self._map.close()
+        self._handle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def names(self):
+        return list(self.entries)
+
+    def header(self, name):
+        """Complete header line (less the ``>``) of a sequence"""
+        offset = self.entries[name].offset
+        # The header is the line ending just before the sequence starts. A
+        # '>' may also appear in its description, so look for the start of
+        # the line rather than for the '>'.
+        start = self._map.rfind(b'\n', 0, offset - 1) + 2
+        return self._map[start:offset].rstrip(b'\r\n')
+
+    def fetch(self, name, start, end):
+        """Bases [start, end) of a sequence"""
+        entry = self.entries[name]
+        raw = self._map[entry.byte(start):entry.byte(end)]
+        return raw.translate(None, b'\r\n')
+
+    def chunks(self, name, start, end, size=CHUNK_SIZE):
+        """Bases [start, end) of a sequence, ``size`` at a time"""
+        for chunk_start in range(start, end, size):
+            yield self.fetch(name, chunk_start, min(chunk_start + size, end))
+
+
+def records(handle):
+    """Yield the (header, sequence) of every record in a FASTA file
+
+    A fallback for files which can't be indexed: each sequence is read into
+    a single bytes object.
+    """
+    header = None
+    lines = []
+    for line in handle:
+        if not isinstance(line, bytes):
+            line = line.encode('ascii')
+        if line.startswith(b'>'):
+            if header is not None:
+                yield (header, b''.join(lines))
+            header = line[1:].rstrip(b'\r\n')
+            lines = []
+        elif header is not None:
+            lines.append(line.strip())
+    if header is not None:
+        yield (header, b''.join(lines))
+
+
+def scan_lengths(handle):
+    """Length of every sequence in a FASTA file, by name, counted while
+    reading through the file without keeping any sequence"""
+    lengths = OrderedDict()
+    name = None
+    for line in handle:
+        if not isinstance(line, bytes):
+            line = line.encode('ascii')
+        if line.startswith(b'>'):
+            name = record_id(line[1:])
+            lengths[name] = 0
+        elif name is not None:
+            lengths[name] += len(line.strip())
+    return lengths
+
+
+def record_id(header):
+    """Identifier of a record, the first word of its header"""
+    return header.split(None, 1)[0].decode('ascii') if header.strip() else ''
+
+
+class Writer(object):
+    """Write FASTA records, wrapping sequence lines at ``width`` bases
+
+    Sequence can be written a piece at a time, lines are wrapped across
+    pieces.
+    """
+
+    def __init__(self, handle, width=LINE_WIDTH):
+        self.handle = handle
+        self.width = width
+        self.column = 0
+
+    def record(self, header):
+        """Start a new record"""
+        self.finish()
+        self.handle.write(b'>' + header + b'\n')
+
+    def write(self, sequence):
+        pieces = []
+        pos = 0
+        if self.column:
+            # Fill up the line left open by the previous piece
+            pos = min(self.width - self.column, len(sequence))
+            pieces.append(sequence[:pos])
+            self.column += pos
+            if self.column == self.width:
+                pieces.append(b'\n')
+                self.column = 0
+        # Then as many whole lines as there are, and the start of the next
+        full = len(sequence) - (len(sequence) - pos) % self.width
+        pieces.extend(sequence[i:i + self.width] + b'\n'
+                      for i in range(pos, full, self.width))
+        if full < len(sequence):
+            pieces.append(sequence[full:])
+            self.column = len(sequence) - full
+        self.handle.write(b''.join(pieces))
+
+    def finish(self):
+        """End the last line of the current record"""
+        if self.column:
+            self.handle.write(b'\n')
+            self.column = 0
@@ -0,0 +1,69 @@
+"""PAUSE genome lengths
+
+The analysis only needs the length of each contig, which can usually be
+had without reading the genome at all. ``lengths`` tries a list of sources
+in turn, cheapest first:
+
+ - the reference lengths in the BAM file's header
+ - the genome's ``.fai`` index (which is built if missing)
+ - counting through the genome FASTA file
+
+Each source is a function of ``(bam_file, genome)`` returning a mapping of
+contig name to length, or None if it can't be used.
+"""
+from __future__ import absolute_import
+import cpt_pause.bam
+import cpt_pause.fasta
+
+
+def _path(data_file):
+    """File name of a file name or open file (None if it has none)"""
+    if data_file is None or isinstance(data_file, str):
+        return data_file
+    return getattr(data_file, 'name', None)
+
+
+def from_bam(bam_file, genome):
+    path = _path(bam_file)
+    if path is None:
+        return None
+    try:
+        return cpt_pause.bam.reference_lengths(path)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def from_fai(bam_file, genome):
+    path = _path(genome)
+    if path is None:
+        return None
+    try:
+        entries = cpt_pause.fasta.index(path)
+    except (IOError, OSError, ValueError):
+        return None
+    return dict((name, entry.length) for name, entry in entries.items())
+
+
+def from_scan(bam_file, genome):
+    if genome is None:
+        return None
+    if isinstance(genome, str):
+        with open(genome, 'rb') as handle:
+            return cpt_pause.fasta.scan_lengths(handle)
+    return cpt_pause.fasta.scan_lengths(genome)
+
+
+LENGTH_SOURCES = (from_bam, from_fai, from_scan)
+
+
+def lengths(chroms, bam_file=None, genome=None, sources=LENGTH_SOURCES):
+    """Length of each of ``chroms``, from the first source that knows them
+    all"""
+    found = None
+    for source in sources:
+        found = source(bam_file, genome)
+        if found is not None and all(chrom in found for chrom in chroms):
+            return dict((chrom, found[chrom]) for chrom in chroms)
+    missing = chroms if found is None else \
+        [chrom for chrom in chroms if chrom not in found]
+    raise Exception("Could not find %s in genome" % ', '.join(missing))
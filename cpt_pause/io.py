@@ -0,0 +1,404 @@
+"""PAUSE wig input/output
+"""
+from __future__ import absolute_import
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+import numpy
+
+# Number of positions formatted per write call. Large enough that the
+# per-call overhead vanishes, small enough that memory use stays flat.
+CHUNK_SIZE = 65536
+
+
+def track_name(bam_file, suffix):
+    """Wig track name for a BAM file (e.g. ``angus_f`` for ``angus.bam``)"""
+    return "%s_%s" % (os.path.splitext(os.path.split(bam_file)[-1])[0],
+                      suffix)
+
+
+# Supported wig output layouts
+WIG_FORMATS = {
+    'variableStep': 'variableStep, one line per base',
+    'sparse': 'variableStep, omitting bases with a value of zero',
+    'fixedStep': 'fixedStep, one value per base with no coordinate column',
+    'bedGraph': 'bedGraph, one line per run of equal values',
+}
+
+
+def write_wig(handle, name, chrom, values, wig_format='variableStep',
+              chunk_size=CHUNK_SIZE):
+    """Stream a per-base array to ``handle`` as a wig (or bedGraph) track
+
+    ``values[i]`` is written at wig position ``i + 1``. Lines are formatted a
+    chunk at a time with a single string formatting operation, rather than
+    one write (or string concatenation) per base.
+
+    Every format allows the length of the track to be recovered when it is
+    read back in. The sparse format always includes the final position, even
+    when it is zero, and bedGraph includes runs of zeros.
+    """
+    if wig_format not in WIG_FORMATS:
+        raise ValueError("Unknown wig format %s" % wig_format)
+
+    values = numpy.asarray(values)
+    # Integer counts are formatted as such, which is a good deal cheaper than
+    # %.1f and produces identical text.
+    if values.dtype.kind in 'iu':
+        value_fmt = "%d.0"
+    else:
+        value_fmt = "%.1f"
+
+    if wig_format == 'bedGraph':
+        handle.write("track type=bedGraph name=%s visibility=full\n" % name)
+        if len(values) == 0:
+            return
+        # Run boundaries are wherever the value changes
+        breaks = numpy.flatnonzero(numpy.diff(values)) + 1
+        starts = numpy.concatenate(([0], breaks))
+        ends = numpy.concatenate((breaks, [len(values)]))
+        line = chrom.replace('%', '%%') + "\t%d\t%d\t" + value_fmt + "\n"
+        _write_rows(handle, line, (starts, ends, values[starts]), chunk_size)
+        return
+
+    handle.write("track type=wiggle_0 name=%s visibility=full\n" % name)
+    if wig_format == 'fixedStep':
+        handle.write("fixedStep chrom=%s start=1 step=1\n" % chrom)
+        _write_rows(handle, value_fmt + "\n", (values,), chunk_size)
+        return
+
+    handle.write("variableStep chrom=%s\n" % chrom)
+    positions = numpy.arange(1, len(values) + 1)
+    if wig_format == 'sparse':
+        keep = values != 0
+        keep[-1:] = True
+        positions = positions[keep]
+        values = values[keep]
+    _write_rows(handle, "%d " + value_fmt + "\n", (positions, values),
+                chunk_size)
+
+
+def _write_rows(handle, line, columns, chunk_size):
+    """Format equal length columns into ``line`` and write them, in chunks"""
+    for offset in range(0, len(columns[0]), chunk_size):
+        chunk = [c[offset:offset + chunk_size] for c in columns]
+        rows = numpy.column_stack(chunk).ravel().tolist()
+        handle.write((line * len(chunk[0])) % tuple(rows))
+
+
+# Lines which are not data: track definitions, comments, and the
+# variableStep/fixedStep declarations which start a new block of data
+_HEADER_RE = re.compile(r'^(?:track|browser|#|variableStep|fixedStep).*$',
+                        re.MULTILINE)
+_BED_RE = re.compile(r'^(\S+)\s+(\S+)\s+(\S+)\s+(\S+).*$', re.MULTILINE)
+
+
+def read_wig(handle):
+    """Read a wig (or bedGraph) file into typed arrays, per chromosome
+
+    Returns an OrderedDict mapping chromosome name to a tuple of
+    ``(positions, values)``. Like ``bx.wiggle.Reader``, positions are
+    zero-based (wig position ``1`` is returned as ``0``) and spans are expanded
+    into one entry per base.
+
+    Rather than handling the file line by line, every block of data between
+    two header lines is parsed with a single ``numpy.fromstring`` call.
+    """
+    text = handle.read()
+    pieces = OrderedDict()
+    # bedGraph data is expected until a wig declaration is seen
+    header = {'mode': 'bed'}
+    block_start = 0
+    for match in list(_HEADER_RE.finditer(text)) + [None]:
+        if match is None:
+            block_end = len(text)
+        else:
+            block_end = match.start()
+
+        body = text[block_start:block_end]
+        if body.strip():
+            for chrom, positions, values in _parse_block(header, body):
+                pieces.setdefault(chrom, []).append((positions, values))
+
+        if match is None:
+            break
+        line = match.group(0)
+        if line.startswith('variableStep') or line.startswith('fixedStep'):
+            header = dict(field.split('=') for field in line.split()[1:])
+            header['mode'] = line.split()[0]
+        elif line.startswith('track'):
+            header = {'mode': 'bed'}
+        block_start = match.end()
+
+    tracks = OrderedDict()
+    for chrom in pieces:
+        positions = numpy.concatenate([p[0] for p in pieces[chrom]])
+        values = numpy.concatenate([p[1] for p in pieces[chrom]])
+        tracks[chrom] = (positions, values)
+    return tracks
+
+
+@contextmanager
+def atomic_path(path):
+    """Temporary name to write ``path`` under, renamed to ``path`` after
+
+    The name is unique, in the same directory as ``path``, and does not exist
+    yet (some writers, e.g. samtools, refuse to overwrite a file). Once the
+    block completes whatever was written there, file or directory, is moved
+    into place, so concurrent readers never see a partially written
+    ``path``. If the block or the rename fails it is removed again, and the
+    error raised.
+    """
+    tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+    try:
+        yield tmp_path
+        os.rename(tmp_path, path)
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_wig(handle, cache_dir=None):
+    """Read a wig file like ``read_wig``, using a binary cache if possible
+
+    The cache lives in ``cache_dir``, or the ``PAUSE_CACHE_DIR`` environment
+    variable if that is not given. When neither is set, or ``handle`` is not
+    a file on disk, this is identical to ``read_wig``.
+
+    Cached arrays are stored as ``.npy`` files keyed on a digest of the
+    source file's contents, so an identical file under another name (e.g. a
+    re-run Galaxy dataset) is found too. They are memory-mapped read-only
+    when loaded, so re-running with different parameters neither re-parses
+    the text nor copies the data. Integer values are cached (and returned)
+    in the smallest dtype holding them, see ``compact``.
+
+    Entries are evicted once none of the files they were made from still
+    exists unchanged.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get('PAUSE_CACHE_DIR')
+    path = getattr(handle, 'name', None)
+    if not cache_dir or path is None or not os.path.isfile(path):
+        return read_wig(handle)
+
+    entry = os.path.join(cache_dir, _digest(path))
+    index = os.path.join(entry, 'index.txt')
+    source = _source_line(path)
+
+    if os.path.exists(index):
+        tracks = OrderedDict()
+        with open(index, 'r') as index_handle:
+            chroms = index_handle.read().splitlines()
+        for i, chrom in enumerate(chroms):
+            tracks[chrom] = tuple(
+                numpy.load(os.path.join(entry, '%s.%s.npy' % (i, kind)),
+                           mmap_mode='r')
+                for kind in ('positions', 'values'))
+        _add_source(entry, source)
+        return tracks
+
+    tracks = read_wig(handle)
+    for chrom, (positions, values) in tracks.items():
+        if len(values) and (values == numpy.round(values)).all():
+            tracks[chrom] = (positions, compact(values))
+    _evict(cache_dir)
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        with atomic_path(entry) as tmp:
+            os.mkdir(tmp)
+            for i, (positions, values) in enumerate(tracks.values()):
+                numpy.save(os.path.join(tmp, '%s.positions.npy' % i),
+                           positions)
+                numpy.save(os.path.join(tmp, '%s.values.npy' % i), values)
+            with open(os.path.join(tmp, 'sources.txt'), 'w') as source_handle:
+                source_handle.write(source)
+            with open(os.path.join(tmp, 'index.txt'), 'w') as index_handle:
+                index_handle.write(''.join('%s\n' % c for c in tracks))
+    except OSError:
+        # Another job got there first, or the cache is not writable. Either
+        # way the data we have just parsed is still good.
+        _add_source(entry, source)
+    return tracks
+
+
+def _digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents, read a chunk at a time"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_line(path):
+    """Line recording a file a cache entry was made from, as it is now"""
+    stat = os.stat(path)
+    return '%s\t%d\t%r\n' % (os.path.realpath(path), stat.st_size,
+                               stat.st_mtime)
+
+
+def _add_source(entry, source):
+    """Record that a cache entry also holds the data of ``source``"""
+    sources = os.path.join(entry, 'sources.txt')
+    try:
+        with open(sources, 'r') as handle:
+            if source in handle.readlines():
+                return
+        with open(sources, 'a') as handle:
+            handle.write(source)
+    except (IOError, OSError):
+        pass
+
+
+def _evict(cache_dir):
+    """Remove cache entries none of whose source files is still unchanged"""
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        # Entries being written (and anything else) are left alone
+        if len(name) != 40 or name.startswith('.'):
+            continue
+        entry = os.path.join(cache_dir, name)
+        try:
+            with open(os.path.join(entry, 'sources.txt'), 'r') as handle:
+                sources = handle.readlines()
+        except (IOError, OSError):
+            sources = []
+        current = False
+        for line in sources:
+            try:
+                current = _source_line(line.split('\t', 1)[0]) == line
+            except OSError:
+                pass
+            if current:
+                break
+        if not current:
+            shutil.rmtree(entry, ignore_errors=True)
+
+
+def _parse_block(header, body):
+    """Parse the data lines following a single header
+
+    Returns a list of (chrom, positions, values)
+    """
+    if header['mode'] == 'bed':
+        rows = _BED_RE.findall(body)
+        chroms = numpy.array([row[0] for row in rows])
+        numbers = numpy.array([row[1:] for row in rows], dtype=float)
+        # Keep chromosomes in the order they first appear in
+        _, first = numpy.unique(chroms, return_index=True)
+        parsed = []
+        for chrom in chroms[numpy.sort(first)]:
+            block = numbers[chroms == chrom]
+            parsed.append((str(chrom),) + _expand(
+                block[:, 0].astype(numpy.int64),
+                block[:, 1].astype(numpy.int64), block[:, 2]))
+        return parsed
+
+    span = int(header.get('span', 1))
+    data = numpy.fromstring(body, sep=' ')
+    if header['mode'] == 'variableStep':
+        if len(data) % 2 != 0:
+            raise ValueError("Malformed variableStep data for %s" %
+                             header['chrom'])
+        data = data.reshape(-1, 2)
+        starts = data[:, 0].astype(numpy.int64) - 1
+        values = data[:, 1]
+    else:
+        step = int(header['step'])
+        values = data
+        starts = int(header['start']) - 1 + step * numpy.arange(len(values))
+        # A later block may continue without repeating the declaration
+        header['start'] = str(starts[-1] + step + 1)
+    return [(header['chrom'],) + _expand(starts, starts + span, values)]
+
+
+def _expand(starts, ends, values):
+    """Expand [start, end) intervals into one (position, value) per base"""
+    lengths = ends - starts
+    if (lengths == 1).all():
+        return (starts, values)
+    offsets = numpy.arange(lengths.sum()) - \
+        numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    return (numpy.repeat(starts, lengths) + offsets,
+            numpy.repeat(values, lengths))
+
+
+def densify(positions, values, length=None):
+    """Expand sparse (position, value) data so every position has a value
+
+    Sparse wig files omit positions with a value of zero. Analysis expects
+    index ``i`` to hold position ``i``, so missing positions are filled back
+    in with zeros.
+    """
+    if length is None:
+        length = positions.max() + 1 if len(positions) else 0
+    if len(positions) == length and \
+            (len(positions) == 0 or positions[-1] == length - 1):
+        return values
+    dense = numpy.zeros(length, dtype=values.dtype)
+    dense[positions] = values
+    return dense
+
+
+def compact(values):
+    """Integer values in the smallest signed dtype holding them
+
+    Signed, so the values can still be negated (e.g. to draw the reverse
+    strand below the axis). Non-integer values are truncated. Values
+    already of that dtype are returned as they are, without a copy.
+    """
+    values = numpy.asarray(values)
+    extreme = max(abs(values.min()), abs(values.max())) if len(values) else 0
+    for dtype in (numpy.int16, numpy.int32):
+        if extreme <= numpy.iinfo(dtype).max:
+            return values.astype(dtype, copy=False)
+    return values.astype(numpy.int64, copy=False)
+
+
+def write_pileups(handle, bam_file, pileups, attr, suffix,
+                  wig_format='variableStep'):
+    """Write one of the arrays of every Pileup to a single wig file
+
+    Each track is preceded by a comment recording how many reads were
+    counted, and filtered, see ``cpt_pause.bam.Pileup.comment``.
+    """
+    for pileup in pileups:
+        handle.write(pileup.comment())
+        write_wig(handle, track_name(bam_file.name, suffix), pileup.chrom,
+                  getattr(pileup, attr), wig_format=wig_format)
+
+
+@contextmanager
+def output_file(ggo, name, mode='w', extension='txt', filename=None):
+    """Open the file GalaxyGetOpt would write the output ``name`` to
+
+    This allows streaming data to an output rather than handing
+    ``OutputFiles.CRR`` the complete contents as a single string, and
+    writing binary data (``mode='wb'``), which GalaxyGetOpt's writers can't.
+    ``extension`` should be the one the writer for the output's format would
+    have used. With ``filename``, an additional output of that name is
+    opened, as ``OutputFiles.varCRR`` would write it.
+    """
+    from galaxygetopt.outputfiles import OutputFiles
+    off = OutputFiles(name=name, GGO=ggo)
+    off.initFromArgs()
+    off.extension = extension
+    if filename is None:
+        off.given_filename = off.parent_filename
+    else:
+        off.given_filename = filename
+        off.naming_strategy = 'var'
+        # Not the first file written for this output
+        off.times_called = 1
+    with open(off.get_next_file(), mode) as handle:
+        yield handle
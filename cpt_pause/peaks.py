@@ -0,0 +1,239 @@
+"""PAUSE peak detection
+
+``peakdet`` gives exactly the same results as the original pure-Python
+implementation (which tests/test_peaks.py checks it against), but runs in
+compiled code: a numba kernel if numba is installed, otherwise a NumPy
+implementation which handles the signal a block at a time.
+"""
+import sys
+import numpy
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Size of the first block examined by the NumPy implementation. Each later
+# search starts with a block twice the distance to the previous peak (but at
+# least MIN_BLOCK_SIZE), and blocks grow geometrically if no peak is found.
+BLOCK_SIZE = 4096
+MIN_BLOCK_SIZE = 16
+# Where peaks are closer together than this, the per-call overhead of NumPy
+# outweighs the work, and the signal is stepped through SCALAR_CHUNK points
+# at a time in plain Python instead
+SCALAR_BLOCK_SIZE = 64
+SCALAR_CHUNK = 1024
+
+
+def _check_args(v, delta, x):
+    if x is None:
+        x = numpy.arange(len(v))
+
+    v = numpy.asarray(v)
+
+    if len(v) != len(x):
+        sys.exit('Input vectors v and x must have same length')
+
+    if not numpy.isscalar(delta):
+        sys.exit('Input argument delta must be a scalar')
+
+    if delta <= 0:
+        sys.exit('Input argument delta must be positive')
+
+    return (v, x)
+
+
+def peakdet(v, delta, x=None):
+    # https://gist.github.com/endolith/250860
+    """
+    Converted from MATLAB script at http://billauer.co.il/peakdet.html
+
+    Returns two arrays
+
+    function [maxtab, mintab]=peakdet(v, delta, x)
+    %PEAKDET Detect peaks in a vector
+    %        [MAXTAB, MINTAB] = PEAKDET(V, DELTA) finds the local
+    %        maxima and minima ("peaks") in the vector V.
+    %        MAXTAB and MINTAB consists of two columns. Column 1
+    %        contains indices in V, and column 2 the found values.
+    %
+    %        With [MAXTAB, MINTAB] = PEAKDET(V, DELTA, X) the indices
+    %        in MAXTAB and MINTAB are replaced with the corresponding
+    %        X-values.
+    %
+    %        A point is considered a maximum peak if it has the maximal
+    %        value, and was preceded (to the left) by a value lower by
+    %        DELTA.
+
+    % Eli Billauer, 3.4.05 (Explicitly not copyrighted).
+    % This function is released to the public domain; Any use is allowed.
+
+    """
+    (v, x) = _check_args(v, delta, x)
+    if _peakdet_kernel is not None:
+        (maxidx, minidx) = _peakdet_kernel(
+            numpy.asarray(v, dtype=numpy.float64), float(delta))
+    else:
+        (maxidx, minidx) = _peakdet_blocks(v, delta)
+
+    x = numpy.asarray(x)
+    maxtab = numpy.column_stack((x[maxidx], v[maxidx])).astype(int)
+    mintab = numpy.column_stack((x[minidx], v[minidx])).astype(int)
+    # Match the shape numpy gives an empty list of peaks
+    if len(maxidx) == 0:
+        maxtab = maxtab.reshape(0)
+    if len(minidx) == 0:
+        mintab = mintab.reshape(0)
+    return (maxtab, mintab)
+
+
+def _peakdet_blocks(v, delta):
+    """NumPy implementation of peakdet, returning indices of maxima/minima
+
+    peakdet alternates between looking for a maximum and looking for a
+    minimum. While looking for a maximum, the running maximum is all that
+    matters: a maximum is found at the first point which falls more than
+    delta below it, and the search for a minimum then starts from that
+    point (and vice versa). Both steps are done with accumulate/flatnonzero
+    over a block of the signal at a time, or by ``_peakdet_scan`` where
+    peaks are dense.
+    """
+    maxidx = []
+    minidx = []
+    n = len(v)
+    # Extreme value carried into the current search, and its index
+    ext = -numpy.inf
+    extidx = -1
+    start = search_start = 0
+    lookformax = True
+    size = BLOCK_SIZE
+
+    while start < n:
+        if size <= SCALAR_BLOCK_SIZE:
+            chunk = v[start:start + SCALAR_CHUNK].tolist()
+            found = len(maxidx) + len(minidx)
+            (ext, extidx, lookformax, last) = _peakdet_scan(
+                chunk, start, delta, ext, extidx, lookformax, maxidx, minidx)
+            found = len(maxidx) + len(minidx) - found
+            if last is not None:
+                search_start = last + 1
+            start += len(chunk)
+            # Back to blocks once peaks are spaced out again
+            size = max(2 * len(chunk) // (found + 1), MIN_BLOCK_SIZE)
+            continue
+
+        block = v[start:start + size]
+        if lookformax:
+            run = numpy.maximum(numpy.maximum.accumulate(block), ext)
+            hits = numpy.flatnonzero(block < run - delta)
+        else:
+            run = numpy.minimum(numpy.minimum.accumulate(block), ext)
+            hits = numpy.flatnonzero(block > run + delta)
+
+        if len(hits) == 0:
+            if start + size >= n:
+                break
+            # Nothing in this block, carry the running extreme forward
+            if run[-1] != ext:
+                extidx = start + numpy.flatnonzero(block == run[-1])[0]
+                ext = run[-1]
+            start += size
+            size *= 2
+            continue
+
+        hit = hits[0]
+        peak = run[hit]
+        if peak != ext:
+            # The first point reaching the extreme is the one recorded
+            extidx = start + numpy.flatnonzero(block[:hit + 1] == peak)[0]
+        if lookformax:
+            maxidx.append(extidx)
+        else:
+            minidx.append(extidx)
+
+        # Search for the opposite extreme, starting from the point which
+        # ended this one. Its block is sized on how far away this one was, so
+        # closely spaced peaks don't each cost a full BLOCK_SIZE block.
+        lookformax = not lookformax
+        gap = start + hit + 1 - search_start
+        extidx = start + hit
+        ext = v[extidx]
+        start = search_start = extidx + 1
+        size = max(2 * gap, MIN_BLOCK_SIZE)
+
+    return (numpy.array(maxidx, dtype=int), numpy.array(minidx, dtype=int))
+
+
+def _peakdet_scan(values, first, delta, ext, extidx, lookformax, maxidx,
+                  minidx):
+    """Carry _peakdet_blocks' search through ``values`` (a list of the
+    points from index ``first``) a point at a time
+
+    Peaks found are appended to maxidx/minidx. Returns the state to carry
+    on with, ``(ext, extidx, lookformax)``, and the index of the last point
+    which ended a peak (None if none did).
+    """
+    last = None
+    for i, this in enumerate(values, first):
+        if lookformax:
+            if this > ext:
+                ext = this
+                extidx = i
+            elif this < ext - delta:
+                maxidx.append(extidx)
+                lookformax = False
+                ext = this
+                extidx = last = i
+        else:
+            if this < ext:
+                ext = this
+                extidx = i
+            elif this > ext + delta:
+                minidx.append(extidx)
+                lookformax = True
+                ext = this
+                extidx = last = i
+    return (ext, extidx, lookformax, last)
+
+
+def _peakdet_numba(v, delta):
+    """The original loop's state machine, for compilation with numba"""
+    maxidx = numpy.empty(len(v), dtype=numpy.int64)
+    minidx = numpy.empty(len(v), dtype=numpy.int64)
+    nmax = 0
+    nmin = 0
+    mn, mx = numpy.inf, -numpy.inf
+    mnpos, mxpos = -1, -1
+    lookformax = True
+
+    for i in range(len(v)):
+        this = v[i]
+        if this > mx:
+            mx = this
+            mxpos = i
+        if this < mn:
+            mn = this
+            mnpos = i
+
+        if lookformax:
+            if this < mx - delta:
+                maxidx[nmax] = mxpos
+                nmax += 1
+                mn = this
+                mnpos = i
+                lookformax = False
+        else:
+            if this > mn + delta:
+                minidx[nmin] = mnpos
+                nmin += 1
+                mx = this
+                mxpos = i
+                lookformax = True
+
+    return (maxidx[:nmax], minidx[:nmin])
+
+
+if numba is not None:
+    _peakdet_kernel = numba.njit(cache=True)(_peakdet_numba)
+else:
+    _peakdet_kernel = None
@@ -0,0 +1,113 @@
+"""PAUSE workflow in memory
+
+``run`` takes a BAM file and its genome through the same steps as the
+command line tools (starts and coverage, peak calling, region
+identification and plotting), but hands arrays straight from one step to the
+next instead of writing and re-parsing wig files. Wig files can still be
+written along the way if they are wanted.
+"""
+from __future__ import absolute_import
+import os
+import cpt_pause.analysis
+import cpt_pause.bam
+import cpt_pause.genome
+import cpt_pause.io
+import cpt_pause.plot
+
+# Wig files which may be written: (file name, Pileup array, track suffix)
+WIGS = (
+    ('wig.starts.f.txt', 'starts_f', 'f'),
+    ('wig.starts.r.txt', 'starts_r', 'r'),
+    ('wig.coverage.f.txt', 'cov_f', 'f'),
+    ('wig.coverage.r.txt', 'cov_r', 'r'),
+)
+
+
+class Result(object):
+    """Everything produced by a run, contig by contig
+
+    ``pileups`` holds the start and coverage arrays of each contig,
+    ``analyses`` the matching ContigAnalysis and ``plots`` the plot of each
+    contig (or None if plotting was skipped).
+    """
+
+    def __init__(self, pileups, analyses, plots):
+        self.pileups = pileups
+        self.analyses = analyses
+        self.plots = plots
+
+    @property
+    def report(self):
+        return cpt_pause.analysis.report(self.analyses)
+
+    @property
+    def region_list(self):
+        return cpt_pause.analysis.region_list(self.analyses)
+
+    def highlights(self, strand):
+        return cpt_pause.analysis.highlights(self.analyses, strand)
+
+
+def run(bam_file, genome, threads=1, delta=40, max_pairs=0, plot=True,
+        plot_format='svg', wig_dir=None, wig_format='variableStep',
+        read_filter=None):
+    """Run the PAUSE workflow on a BAM file, returning a Result
+
+    ``bam_file`` and ``genome`` may be file names or open files. Plots are
+    made in ``plot_format`` (see ``cpt_pause.plot.PLOT_FORMATS``). If
+    ``wig_dir`` is given, the starts and coverage wig files the tools would
+    have produced are written there too. Reads are filtered by
+    ``read_filter`` (see ``cpt_pause.bam.ReadFilter``).
+    """
+    if not hasattr(bam_file, 'name'):
+        with open(bam_file, 'rb') as handle:
+            return run(handle, genome, threads=threads, delta=delta,
+                       max_pairs=max_pairs, plot=plot,
+                       plot_format=plot_format, wig_dir=wig_dir,
+                       wig_format=wig_format, read_filter=read_filter)
+
+    pileups = cpt_pause.bam.scan(bam_file, threads=threads,
+                                 read_filter=read_filter)
+    if wig_dir is not None:
+        write_wigs(wig_dir, bam_file, pileups, wig_format=wig_format)
+
+    lengths = cpt_pause.genome.lengths([pileup.chrom for pileup in pileups],
+                                       bam_file=bam_file, genome=genome)
+
+    analyses = []
+    for pileup in pileups:
+        analyses.append(cpt_pause.analysis.analyse_contig(
+            pileup.chrom, pileup.starts_f, pileup.starts_r, pileup.cov_f,
+            pileup.cov_r, lengths[pileup.chrom], delta=delta,
+            max_pairs=max_pairs or None, titled=len(pileups) > 1))
+
+    plots = [None] * len(pileups)
+    if plot:
+        plots = [plot_contig(pileup, analysis, format=plot_format)
+                 for pileup, analysis in zip(pileups, analyses)]
+    return Result(pileups, analyses, plots)
+
+
+def write_wigs(directory, bam_file, pileups, wig_format='variableStep'):
+    """Write the starts and coverage of every Pileup to ``directory``"""
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name, attr, suffix in WIGS:
+        with open(os.path.join(directory, name), 'w') as handle:
+            cpt_pause.io.write_pileups(handle, bam_file, pileups, attr,
+                                       suffix, wig_format=wig_format)
+
+
+def plot_contig(pileup, analysis, format='svg'):
+    """Plot a contig exactly as pause_plotter.py would from the wig files"""
+    highlights = [(cpt_pause.plot.highlight_rows(peaks), sign)
+                  for peaks, sign in
+                  ((analysis.max_f, 1), (analysis.max_r, -1)) if len(peaks)]
+    # The reverse strand is negated as it is drawn, rather than copied
+    return cpt_pause.plot.plot_contig(
+        [pileup.cov_f, pileup.cov_r],
+        [pileup.starts_f, pileup.starts_r],
+        [rows for rows, sign in highlights],
+        format=format,
+        signs=[1, -1, 1, -1] + [sign for rows, sign in highlights])
+
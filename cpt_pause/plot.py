@@ -0,0 +1,55 @@
+"""PAUSE plots of a single contig
+"""
+import numpy
+from cpt_pause import Coverage, Filter, Gfx, Highlight
+
+
+# Supported plot output formats
+PLOT_FORMATS = {
+    'svg': 'SVG',
+    'png': 'PNG, better suited to very large genomes',
+}
+
+
+def plot_contig(coverage, starts, highlights, format='svg', signs=None):
+    """Plot the (position, value) arrays of a single contig
+
+    Each argument is a list of arrays, one per track. Arrays are either
+    (position, value) rows, or the value of every position from 0 onwards.
+    Values for the reverse strand should be drawn below the axis: either
+    negate them beforehand, or give ``signs``, the sign (1 or -1) of every
+    track (coverage, then starts, then highlights), which negates them as
+    they are drawn instead of copying them.
+    Returns an SVG document, or PNG image data if ``format`` is ``png``.
+    """
+    if signs is None:
+        signs = [1] * (len(coverage) + len(starts) + len(highlights))
+    signs = iter(signs)
+    track_list = []
+
+    # Coverage is handled separately and "just for looks". Gfx reduces it
+    # to what can be seen at the plot's resolution.
+    for reshaped in coverage:
+        track_list.append(Coverage(reshaped, opacity=0.5, sign=next(signs)))
+
+    # Starts are handled separately from coverage
+    for reshaped in starts:
+        # Pass filter, then remove repeated y values
+        reshaped = Filter.repeat_reduction(
+            Filter.minpass(reshaped, min_value=2))
+        track_list.append(Coverage(reshaped, line_color='blue',
+                                   sign=next(signs)))
+
+    for reshaped in highlights:
+        track_list.append(Highlight(reshaped, sign=next(signs)))
+
+    g = Gfx(track_list)
+    return g.plot(format=format)
+
+
+def highlight_rows(peaks, sign=1):
+    """(position, value) rows for a peak table, as read back from its wig"""
+    rows = numpy.array(peaks, dtype=int).reshape(-1, 2)
+    rows[:, 0] -= 1
+    rows[:, 1] *= sign
+    return rows
@@ -0,0 +1,114 @@
+"""PAUSE raster graphics
+
+A minimal RGB canvas backed by a numpy array, with just the drawing
+operations PAUSE plots need, and a PNG encoder. Drawing works on whole
+blocks of pixels at a time, so the cost depends on the size of the image
+rather than on the amount of data plotted.
+"""
+import struct
+import zlib
+import numpy
+
+# SVG colour keywords used by the PAUSE tracks
+COLORS = {
+    'black': (0, 0, 0),
+    'blue': (0, 0, 255),
+    'gray': (128, 128, 128),
+    'grey': (128, 128, 128),
+    'red': (255, 0, 0),
+    'white': (255, 255, 255),
+}
+
+
+def parse_color(color):
+    """RGB tuple for an SVG colour keyword or ``#rrggbb``"""
+    if color in COLORS:
+        return COLORS[color]
+    if color.startswith('#') and len(color) == 7:
+        return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+    raise ValueError("Unknown colour %s" % color)
+
+
+class Canvas(object):
+    """RGB image, ``pixels[y, x]``, with (0, 0) at the top left"""
+
+    def __init__(self, width, height, background='white'):
+        self.width = int(width)
+        self.height = int(height)
+        self.pixels = numpy.empty((self.height, self.width, 3),
+                                  dtype=numpy.uint8)
+        self.pixels[:, :] = parse_color(background)
+
+    def blend(self, mask, color, opacity=1.0, top=0, left=0):
+        """Paint the pixels set in ``mask``, placed with its top left corner
+        at (``left``, ``top``)"""
+        if color == 'none' or opacity <= 0:
+            return
+        # Only the part of the mask which is on the canvas
+        (height, width) = mask.shape
+        rows = slice(max(top, 0), min(top + height, self.height))
+        cols = slice(max(left, 0), min(left + width, self.width))
+        if rows.start >= rows.stop or cols.start >= cols.stop:
+            return
+        mask = mask[rows.start - top:rows.stop - top,
+                    cols.start - left:cols.stop - left]
+        block = self.pixels[rows, cols]
+        if opacity >= 1:
+            block[mask] = parse_color(color)
+            return
+        rgb = numpy.array(parse_color(color), dtype=numpy.float64)
+        painted = block[mask] * (1.0 - opacity) + rgb * opacity
+        block[mask] = numpy.round(painted).astype(numpy.uint8)
+
+    def spans(self, x0, lo, hi, color, opacity=1.0):
+        """Fill a vertical span [lo[i], hi[i]] in each column ``x0 + i``"""
+        if len(lo) == 0:
+            return
+        lo = numpy.floor(lo).astype(int)
+        hi = numpy.floor(hi).astype(int)
+        top = int(lo.min())
+        rows = numpy.arange(top, int(hi.max()) + 1)[:, numpy.newaxis]
+        self.blend((rows >= lo) & (rows <= hi), color, opacity, top=top,
+                   left=int(x0))
+
+    def rect(self, x, y, width, height, color, opacity=1.0):
+        """Outline of a rectangle, one pixel wide"""
+        (width, height) = (int(width), int(height))
+        mask = numpy.zeros((height + 1, width + 1), dtype=bool)
+        mask[[0, -1], :] = True
+        mask[:, [0, -1]] = True
+        self.blend(mask, color, opacity, top=int(y), left=int(x))
+
+    def vline(self, x, y0, y1, color, opacity=1.0):
+        """Vertical line, one pixel wide"""
+        mask = numpy.ones((int(y1) - int(y0) + 1, 1), dtype=bool)
+        self.blend(mask, color, opacity, top=int(y0), left=int(x))
+
+    def circle(self, cx, cy, r, color, line_width=1, opacity=1.0):
+        """Outline of a circle"""
+        half = line_width / 2.0
+        reach = int(numpy.ceil(r + half))
+        dy, dx = numpy.mgrid[-reach:reach + 1, -reach:reach + 1]
+        ring = numpy.abs(numpy.hypot(dx, dy) - r) <= half
+        self.blend(ring, color, opacity, top=int(round(cy)) - reach,
+                   left=int(round(cx)) - reach)
+
+    def png(self):
+        """Encode the canvas as a PNG image"""
+        # Every scanline is prefixed with filter type 0 (none)
+        raw = numpy.zeros((self.height, self.width * 3 + 1),
+                          dtype=numpy.uint8)
+        raw[:, 1:] = self.pixels.reshape(self.height, -1)
+        header = struct.pack('>IIBBBBB', self.width, self.height, 8, 2, 0, 0,
+                             0)
+        return b''.join([
+            b'\x89PNG\r\n\x1a\n',
+            _chunk(b'IHDR', header),
+            _chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)),
+            _chunk(b'IEND', b''),
+        ])
+
+
+def _chunk(kind, data):
+    crc = zlib.crc32(kind + data) & 0xffffffff
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', crc)
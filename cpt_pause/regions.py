@@ -0,0 +1,206 @@
+"""PAUSE region identification
+"""
+import numpy
+
+
+class CoverageIndex(object):
+    """Constant time lookup of average coverage over a stretch of genome
+
+    Built once from per-base forward and reverse coverage, after which the
+    average of the two over any [start, end) takes two lookups in a prefix
+    sum. Arcs with start > end wrap around the end of the (circular) genome.
+    Arguments may be scalars or arrays of positions.
+    """
+
+    def __init__(self, cov_f, cov_r):
+        cov_f = numpy.asarray(cov_f)
+        cov_r = numpy.asarray(cov_r)
+        if cov_f.dtype.kind in 'iub' and cov_r.dtype.kind in 'iub':
+            dtype = numpy.int64
+        else:
+            dtype = numpy.float64
+        self.length = len(cov_f)
+        self.prefix = numpy.zeros(self.length + 1, dtype=dtype)
+        numpy.cumsum(cov_f, dtype=dtype, out=self.prefix[1:])
+        self.prefix[1:] += numpy.cumsum(cov_r, dtype=dtype)
+
+    def total(self, start, end):
+        """Sum of forward plus reverse coverage over [start, end)"""
+        start = numpy.clip(start, 0, self.length)
+        end = numpy.clip(end, 0, self.length)
+        span = self.prefix[end] - self.prefix[start]
+        wrapped = self.prefix[-1] - self.prefix[start] + self.prefix[end]
+        return numpy.where(start <= end, span, wrapped)
+
+    def size(self, start, end):
+        """Number of bases in [start, end), wrapping if start > end"""
+        start = numpy.clip(start, 0, self.length)
+        end = numpy.clip(end, 0, self.length)
+        return numpy.where(start <= end, end - start,
+                           self.length - start + end)
+
+    def mean(self, start, end):
+        """Average of forward and reverse coverage over [start, end)"""
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            mean = self.total(start, end) / (2.0 * self.size(start, end))
+        # Scalars in, scalar out
+        return mean[()]
+
+
+class PairScores(object):
+    """Scores for every (forward peak, reverse peak) pair at once
+
+    Each attribute is a matrix with one row per forward peak and one column
+    per reverse peak:
+
+    - ``examined``: the region is small enough (< half the genome) to be
+      considered at all
+    - ``between``: average coverage of the region from pf to pr (possibly
+      wrapping around the end of the genome)
+    - ``outside``: average coverage of the rest of the genome
+    - ``candidate``: the region is a likely repeat region
+    """
+
+    def __init__(self, peak_f, peak_r, index, gl, genome_end):
+        self.pf = peak_f
+        self.pr = peak_r
+        pf = peak_f[:, numpy.newaxis]
+        pr = peak_r[numpy.newaxis, :]
+
+        forward = pf < pr
+        self.examined = (forward & (pr - pf < (.5 * gl))) | \
+            ((pf > pr) & ((genome_end - pf + pr) < (.5 * gl)))
+        self.between = numpy.where(
+            forward, index.mean(pf, pr),
+            index.mean(0, pr) + index.mean(pf, genome_end))
+        self.outside = numpy.where(
+            forward, index.mean(0, pf) + index.mean(pr, genome_end),
+            index.mean(pr, pf))
+        self.candidate = self.examined & \
+            (self.between > (self.outside * 1.75))
+
+
+def per_base(data):
+    """Per-base values from either a 1-D array or (position, value) rows"""
+    data = numpy.asarray(data)
+    if data.ndim == 2:
+        return data[:, 1]
+    return data
+
+
+def identify_regions(peak_f, peak_r, data_f, data_r, cov_f, cov_r, gl=0,
+                     max_pairs=None, chrom=None):
+    """
+        Function to identify double coverage regions in a genome based on some inputs:
+
+        1. peaks (f/r)
+        2. Coverage data (f/r)
+        3. raw data (f/r)
+
+
+        There are three possible answers to this question
+
+        1) We have a long region 10-20kb, of double coverage
+        2) We have a short region <1kb of double coverage
+        3) We fail to identify any such regions
+
+        We can generalise cases 1 and 2 into "a region with ~1.5x+ coverage
+        compared to rest of genome", and then separate the cases based on length
+        of said region
+
+        Every pair of peaks is scored at once (see PairScores). The report is
+        returned as a list of lines. If max_pairs is set, only that many
+        pairs are described in the examined and process sections of the
+        report, so only their lines are formatted. If chrom is set it is
+        included in the report's title.
+
+        Coverage may be given as per-base arrays, or as (position, value)
+        rows with one row per base.
+    """
+    peak_f = numpy.asarray(peak_f, dtype=int).reshape(-1, 2)[:, 0]
+    peak_r = numpy.asarray(peak_r, dtype=int).reshape(-1, 2)[:, 0]
+
+    # Coverage over any stretch of the genome can be looked up in constant
+    # time from here on
+    index = CoverageIndex(per_base(cov_f), per_base(cov_r))
+    genome_end = max([gl] + list(peak_f) + list(peak_r))
+
+    # Our hypothesis is that the region between the two* will be double the
+    # coverage of the rest of the genome. However, this hypothesis does not
+    # hold for regions which make up a significant portion of the genome
+    # (e.g. a small region is "outside" and averaged against the rest of the
+    # region which is "inside"), so we have to discount regions where outside
+    # < inside
+    #
+    # * (moving right from pf, possibly wrapping around end of genome to get
+    # to pr),
+    scores = PairScores(peak_f, peak_r, index, gl, genome_end)
+    concl_base = [[peak_f[i], peak_r[j]]
+                  for (i, j) in zip(*numpy.nonzero(scores.candidate))]
+    return (list(_report(scores, concl_base, max_pairs, chrom)), concl_base)
+
+
+def _shown(mask, max_pairs):
+    """(i, j) indices of the pairs set in mask to describe, and how many of
+    them are left out because of max_pairs"""
+    (rows, cols) = numpy.nonzero(mask)
+    hidden = 0
+    if max_pairs is not None and len(rows) > max_pairs:
+        hidden = len(rows) - max_pairs
+        rows = rows[:max_pairs]
+        cols = cols[:max_pairs]
+    return (zip(rows, cols), hidden)
+
+
+def _report(scores, concl_base, max_pairs=None, chrom=None):
+    """Generate the lines of the PAUSE report"""
+    pf = scores.pf
+    pr = scores.pr
+
+    if chrom is None:
+        yield '# PAUSE Report'
+    else:
+        yield '# PAUSE Report: %s' % chrom
+    for line in [
+        '',
+        'This report was automatically generated by the PAUSE software. It merely records some information about the analysis process',
+        '',
+        'These regions were examined: ',
+        ''
+    ]:
+        yield line
+
+    (shown, hidden) = _shown(scores.examined, max_pairs)
+    for (i, j) in shown:
+        yield '- %s..%s' % (pf[i], pr[j])
+    if hidden:
+        yield '- ... (%s more)' % hidden
+
+    yield ''
+    yield '## Process'
+    yield ''
+    (shown, hidden) = _shown(numpy.ones_like(scores.examined), max_pairs)
+    for (i, j) in shown:
+        if not scores.examined[i, j]:
+            yield ' - Discounted region [%s..%s] due to size of region as %% of genome' % (pf[i], pr[j])
+        elif scores.candidate[i, j]:
+            yield ' - Found possible region on [%s..%s], where the average coverage (%s) is larger than the rest of the genome (%s)' % (pf[i], pr[j], scores.between[i, j], scores.outside[i, j])
+        else:
+            yield ' - Discounted region [%s..%s], as average coverage (%s) was not significantly larger than the rest of the genome (%s)' % (pf[i], pr[j], scores.between[i, j], scores.outside[i, j])
+    if hidden:
+        yield ' - ... (%s more)' % hidden
+
+    yield ''
+    yield '## Conclusions'
+    yield ''
+    for (start, end) in concl_base:
+        yield ' - Region [%s..%s] is likely candidate for a repeat_region' % (start, end)
+
+    yield ''
+    yield '## Recommendations'
+    yield ''
+    if len(concl_base) == 1:
+        yield 'Recommend re-opening the genome at base %s' % concl_base[0][0]
+    else:
+        yield 'Multiple possible regions were found, you should manually inspect these regions to narrow them down to a single correct location for a repeat'
+    yield ''
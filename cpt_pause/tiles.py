@@ -0,0 +1,163 @@
+"""PAUSE plot tiles
+
+Renders any region of a contig, at any zoom, as a small plot. The starts
+and coverage arrays are summarised once into a pyramid of resolutions (the
+mean and maximum of every bin of 1, 10, 100 and 1000 bases), after which a
+tile only touches the few thousand bins it shows, whatever the genome size.
+Pyramids can be saved to, and loaded from, ``.npz`` files.
+"""
+from __future__ import absolute_import
+import numpy
+from cpt_pause import Coverage, Filter, Gfx, Highlight
+import cpt_pause.plot
+
+# Bin sizes, in bases, of the levels of a pyramid
+LEVELS = (1, 10, 100, 1000)
+
+
+class Pyramid(object):
+    """Summaries of a per-base array at several resolutions
+
+    ``levels`` maps a bin size to the ``(mean, max)`` arrays of every bin of
+    that many bases, with bins starting at position 0.
+    """
+
+    def __init__(self, levels):
+        self.levels = levels
+
+    @classmethod
+    def build(cls, values, bins=LEVELS):
+        values = numpy.asarray(values)
+        levels = {}
+        for size in bins:
+            if size == 1:
+                # Every base is its own bin
+                levels[size] = (values, values)
+                continue
+            starts = numpy.arange(0, len(values), size)
+            counts = numpy.diff(numpy.append(starts, len(values)))
+            sums = numpy.add.reduceat(values, starts, dtype=numpy.float64)
+            levels[size] = ((sums / counts).astype(numpy.float32),
+                            numpy.maximum.reduceat(values, starts))
+        return cls(levels)
+
+    def level(self, bases_per_pixel):
+        """Coarsest bin size which still has a bin for every pixel"""
+        sizes = sorted(self.levels)
+        fitting = [size for size in sizes if size <= bases_per_pixel]
+        return fitting[-1] if fitting else sizes[0]
+
+    def region(self, start, end, bases_per_pixel, stat='max'):
+        """(position, value) rows of the bins overlapping [start, end)
+
+        Bins are taken from the coarsest level with a bin for every pixel,
+        each positioned at its first base. ``stat`` is ``mean`` or ``max``.
+        """
+        size = self.level(bases_per_pixel)
+        values = self.levels[size][1 if stat == 'max' else 0]
+        first = max(int(start) // size, 0)
+        last = min(-(-int(end) // size), len(values))
+        positions = numpy.arange(first, last) * size
+        return numpy.column_stack((positions, values[first:last]))
+
+
+class ContigTiles(object):
+    """Pyramids of a contig's coverage and starts, and its called peaks"""
+
+    # Pileup arrays kept in a pyramid
+    TRACKS = ('cov_f', 'cov_r', 'starts_f', 'starts_r')
+
+    def __init__(self, chrom, length, pyramids, max_f, max_r):
+        self.chrom = chrom
+        self.length = length
+        self.pyramids = pyramids
+        self.max_f = max_f
+        self.max_r = max_r
+
+    @classmethod
+    def build(cls, pileup, analysis, bins=LEVELS):
+        """Summarise a Pileup, and the ContigAnalysis of it"""
+        pyramids = dict((name, Pyramid.build(getattr(pileup, name), bins))
+                        for name in cls.TRACKS)
+        return cls(pileup.chrom, pileup.length, pyramids,
+                   numpy.asarray(analysis.max_f, dtype=int).reshape(-1, 2),
+                   numpy.asarray(analysis.max_r, dtype=int).reshape(-1, 2))
+
+    def save(self, handle):
+        """Write the pyramids to an ``.npz`` file (name or open file)"""
+        arrays = {
+            'chrom': numpy.array(self.chrom),
+            'length': numpy.array(self.length),
+            'max_f': self.max_f,
+            'max_r': self.max_r,
+        }
+        for name, pyramid in self.pyramids.items():
+            for size, (mean, maximum) in pyramid.levels.items():
+                arrays['%s_%d_max' % (name, size)] = maximum
+                # Level 1 means are the values themselves
+                if size != 1:
+                    arrays['%s_%d_mean' % (name, size)] = mean
+        numpy.savez(handle, **arrays)
+
+    @classmethod
+    def load(cls, handle):
+        """Read pyramids written by ``save``"""
+        data = numpy.load(handle)
+        pyramids = {}
+        for name in cls.TRACKS:
+            levels = {}
+            for key in data.files:
+                if key.startswith(name + '_') and key.endswith('_max'):
+                    size = int(key[len(name) + 1:-len('_max')])
+                    maximum = data[key]
+                    if size == 1:
+                        levels[size] = (maximum, maximum)
+                    else:
+                        levels[size] = (data['%s_%d_mean' % (name, size)],
+                                        maximum)
+            pyramids[name] = Pyramid(levels)
+        return cls(str(data['chrom']), int(data['length']), pyramids,
+                   data['max_f'], data['max_r'])
+
+    def tile(self, start, end, width=1000, format='svg'):
+        """Plot [start, end) of the contig as a single row ``width`` pixels
+        wide, in the style of ``cpt_pause.plot.plot_contig``
+
+        The region is clipped to the contig, a ValueError is raised if
+        nothing of it is left.
+        """
+        if min(int(end), self.length) <= max(int(start), 0):
+            raise ValueError("Region %s:%d-%d is empty or outside the contig"
+                             % (self.chrom, start, end))
+        start = max(int(start), 0)
+        end = min(int(end), self.length)
+        bases_per_pixel = float(end - start) / width
+
+        track_list = []
+        # Coverage is drawn from bin averages, starts from bin maxima so
+        # that peaks are never smoothed away
+        for name, sign in (('cov_f', 1), ('cov_r', -1)):
+            rows = self.pyramids[name].region(start, end, bases_per_pixel,
+                                              stat='mean')
+            rows[:, 1] *= sign
+            track_list.append(Coverage(rows, opacity=0.5))
+        for name, sign in (('starts_f', 1), ('starts_r', -1)):
+            rows = self.pyramids[name].region(start, end, bases_per_pixel)
+            rows[:, 1] = sign * Filter.minpass(rows[:, 1], min_value=2)
+            rows = Filter.repeat_reduction(rows)
+            track_list.append(Coverage(rows, line_color='blue'))
+        for peaks, sign in ((self.max_f, 1), (self.max_r, -1)):
+            rows = cpt_pause.plot.highlight_rows(peaks, sign)
+            rows = rows[(rows[:, 0] >= start) & (rows[:, 0] <= end)]
+            if len(rows):
+                track_list.append(Highlight(rows))
+
+        g = Gfx(track_list)
+        return g.plot(width=width, scale=(end - start) / 1000.0,
+                      format=format, start=start, end=end)
+
+
+def build(result, bins=LEVELS):
+    """ContigTiles for every contig of a ``cpt_pause.pipeline.Result``"""
+    return [ContigTiles.build(pileup, analysis, bins)
+            for pileup, analysis in zip(result.pileups, result.analyses)]
@@ -20,6 +20,8 @@ setup(name='cpt-pause',
           'Intended Audience :: Developers',
           'Environment :: Console'
       ],
-      scripts=['bin/pause_analysis.py', 'bin/pause_coverage_to_wiggle.py',
+      scripts=['bin/pause_analysis.py', 'bin/pause_bam_to_wiggle.py',
+               'bin/pause_batch.py',
+               'bin/pause_coverage_to_wiggle.py',
                'bin/pause_plotter.py', 'bin/pause_starts_to_wiggle.py'],
       )
@@ -0,0 +1,77 @@
+"""Check tiled scans of a BAM file combine to the single threaded scan"""
+import os
+import numpy
+import pytest
+
+import cpt_pause.bam
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+ARRAYS = ('starts_f', 'starts_r', 'cov_f', 'cov_r')
+
+
+class BamFile(object):
+    """Stands in for the file handle GalaxyGetOpt passes the tools"""
+
+    def __init__(self, name):
+        self.name = name
+
+
+def tile_list(references, lengths, size, window=None):
+    """Tiles of ``size`` bases over the first ``window`` bases of every
+    reference, and a single tile over the rest of it"""
+    found = []
+    for chrom, length in zip(references, lengths):
+        split = min(window or length, length)
+        found.extend(cpt_pause.bam.tiles([chrom], [split], size))
+        if split < length:
+            found.append(cpt_pause.bam.Tile(chrom, split, length))
+    return found
+
+
+def tiled_scan(bam_file, size, window=None, read_filter=None):
+    """Scan in tiles of ``size`` bases, reassembled as ``scan`` does"""
+    (references, lengths) = cpt_pause.bam.header(bam_file.name)
+    pileups = [cpt_pause.bam.Pileup(chrom, length, read_filter=read_filter)
+               for chrom, length in zip(references, lengths)]
+    by_chrom = dict((pileup.chrom, pileup) for pileup in pileups)
+    tiles = tile_list(references, lengths, size, window)
+    for part in cpt_pause.bam.scan_tiles(bam_file.name, tiles, 2,
+                                         read_filter=read_filter):
+        whole = by_chrom[part.chrom]
+        section = slice(part.offset, part.offset + part.length)
+        for attr in ARRAYS:
+            getattr(whole, attr)[section] = getattr(part, attr)
+        for name in cpt_pause.bam.COUNTERS:
+            whole.counts[name] += part.counts[name]
+    return pileups
+
+
+# Every read in the example has a mapping quality of 255, leaving out the
+# reverse strand makes sure filtered reads are counted by exactly one tile
+FILTERS = [
+    ('default', None),
+    ('forward', cpt_pause.bam.ReadFilter(exclude_flags=0x10)),
+]
+
+
+# Every tile fetches all the reads overlapping it, so the smallest tiles are
+# limited to the start of the reference
+SIZES = [(1, 1000), (7, 7000), (997, None)]
+
+
+@pytest.mark.parametrize('size, window', SIZES,
+                         ids=['%d' % size for size, window in SIZES])
+@pytest.mark.parametrize('name, read_filter', FILTERS,
+                         ids=[name for name, read_filter in FILTERS])
+def test_tiles_match_scan(name, read_filter, size, window):
+    bam_file = BamFile(os.path.join(EXAMPLE, 'angus.bam'))
+    expected = cpt_pause.bam.scan(bam_file, read_filter=read_filter)
+    tiled = tiled_scan(bam_file, size, window, read_filter=read_filter)
+    assert [p.chrom for p in tiled] == [p.chrom for p in expected]
+    for a, b in zip(expected, tiled):
+        for attr in ARRAYS:
+            assert numpy.array_equal(getattr(a, attr), getattr(b, attr)), attr
+        assert a.counts == b.counts
+    assert expected[0].counts['reads'] > 0
+    if read_filter is not None:
+        assert expected[0].counts['flag_filtered'] > 0
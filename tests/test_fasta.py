@@ -0,0 +1,27 @@
+"""Check cpt_pause.fasta reads headers and sequence back as written"""
+import io
+
+import cpt_pause.fasta
+
+GENOME = (b'>seq1 desc a>b\n'
+          b'ACGTACGTAC\n'
+          b'GTAC\n'
+          b'>seq2 >another > one\r\n'
+          b'TTTTGGGGCC\r\n'
+          b'CC\r\n')
+
+
+def test_headers_containing_gt(tmpdir):
+    path = str(tmpdir.join('genome.fa'))
+    with open(path, 'wb') as handle:
+        handle.write(GENOME)
+    with cpt_pause.fasta.Fasta(path) as fasta:
+        assert fasta.names == ['seq1', 'seq2']
+        assert fasta.header('seq1') == b'seq1 desc a>b'
+        assert fasta.header('seq2') == b'seq2 >another > one'
+        assert fasta.fetch('seq2', 8, 12) == b'CCCC'
+    # Same as the fallback for files which can't be indexed
+    assert [header for (header, sequence) in
+            cpt_pause.fasta.records(io.BytesIO(GENOME))] == \
+        [b'seq1 desc a>b', b'seq2 >another > one']
+
@@ -0,0 +1,78 @@
+"""Check cpt_pause.Filter.repeat_reduction against the original loop"""
+import os
+import numpy
+import pytest
+
+import cpt_pause
+import cpt_pause.io
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+
+
+def repeat_reduction_loop(data):
+    """The original implementation of repeat_reduction
+
+    Unlike repeat_reduction this never keeps the last point.
+    """
+    fixed = []
+    # start out with first element
+    fixed.append(data[0])
+    for i in range(1, len(data) - 1):
+        prev = data[i - 1][1]
+        curr = data[i][1]
+        nexe = data[i + 1][1]
+        # If the value is the same as the previos and the next, we ignore it
+        # completely
+        if prev == curr and curr == nexe:
+            pass
+        # Otherwise, we add it to the stack
+        else:
+            fixed.append(data[i])
+    return numpy.array(fixed)
+
+
+def expected(data):
+    """The original loop's result, plus the last point"""
+    fixed = repeat_reduction_loop(data)
+    if len(data) > 1:
+        fixed = numpy.vstack((fixed, data[-1:]))
+    return fixed
+
+
+def synthetic(length, seed=42):
+    """Starts as the plotter sees them: mostly zero, with runs of repeats"""
+    rng = numpy.random.RandomState(seed)
+    starts = rng.poisson(0.3, length)
+    starts[rng.randint(0, length, length // 100)] += 5
+    data = numpy.column_stack((numpy.arange(length), starts))
+    return cpt_pause.Filter.minpass(data, min_value=2)
+
+
+def example(name):
+    with open(os.path.join(EXAMPLE, 'wig.%s.txt' % name)) as handle:
+        (positions, values) = list(cpt_pause.io.read_wig(handle).values())[0]
+    data = numpy.column_stack((positions, values)).astype(int)
+    return cpt_pause.Filter.minpass(data, min_value=2)
+
+
+SIGNALS = [
+    ('starts.f', lambda: example('starts.f')),
+    ('starts.r', lambda: example('starts.r')),
+    ('constant', lambda: numpy.column_stack(
+        (numpy.arange(50), numpy.zeros(50, dtype=int)))),
+] + [('synthetic %d' % size, lambda size=size: synthetic(size, seed=size))
+     for size in (1, 2, 3, 10, 1000)]
+
+
+@pytest.mark.parametrize('name, signal', SIGNALS,
+                         ids=[name for name, signal in SIGNALS])
+def test_repeat_reduction_matches_loop(name, signal):
+    data = signal()
+    assert numpy.array_equal(cpt_pause.Filter.repeat_reduction(data),
+                             expected(data))
+
+
+def test_repeat_reduction_of_values():
+    data = synthetic(1000)
+    assert numpy.array_equal(cpt_pause.Filter.repeat_reduction(data[:, 1]),
+                             cpt_pause.Filter.repeat_reduction(data))
@@ -0,0 +1,57 @@
+"""Check wig files written by cpt_pause.io read back as the same values"""
+import io
+import numpy
+import pytest
+
+import cpt_pause.io
+
+TRACKS = [
+    ('first', numpy.array([0, 0, 3, 3, 3, 0, 7, 1, 0, 0], dtype=numpy.int32)),
+    ('second', numpy.array([5, 0, 0, 2], dtype=numpy.int64)),
+    ('third', numpy.array([0.5, 0.5, 0.0, 2.5, 12.0])),
+]
+
+
+@pytest.mark.parametrize('wig_format', sorted(cpt_pause.io.WIG_FORMATS))
+def test_round_trip(wig_format):
+    handle = io.StringIO()
+    for chrom, values in TRACKS:
+        cpt_pause.io.write_wig(handle, 'test', chrom, values,
+                               wig_format=wig_format, chunk_size=3)
+    handle.seek(0)
+    tracks = cpt_pause.io.read_wig(handle)
+    assert list(tracks) == [chrom for chrom, values in TRACKS]
+    for chrom, values in TRACKS:
+        (positions, read) = tracks[chrom]
+        assert numpy.array_equal(cpt_pause.io.densify(positions, read),
+                                 values)
+
+
+@pytest.mark.parametrize('wig_format', sorted(cpt_pause.io.WIG_FORMATS))
+def test_empty_track(wig_format):
+    handle = io.StringIO()
+    cpt_pause.io.write_wig(handle, 'test', 'empty',
+                           numpy.zeros(0, dtype=int), wig_format=wig_format)
+    handle.seek(0)
+    for (positions, values) in cpt_pause.io.read_wig(handle).values():
+        assert len(values) == 0
+
+
+def test_atomic_path(tmpdir):
+    path = str(tmpdir.join('out.txt'))
+    with cpt_pause.io.atomic_path(path) as tmp_path:
+        assert tmp_path != path
+        with open(tmp_path, 'w') as handle:
+            handle.write('done')
+    with open(path) as handle:
+        assert handle.read() == 'done'
+
+    # A failed write leaves the file as it was, and no temporary file behind
+    with pytest.raises(IOError):
+        with cpt_pause.io.atomic_path(path) as tmp_path:
+            with open(tmp_path, 'w') as handle:
+                handle.write('partial')
+            raise IOError('write failed')
+    assert tmpdir.listdir() == [tmpdir.join('out.txt')]
+    with open(path) as handle:
+        assert handle.read() == 'done'
@@ -0,0 +1,121 @@
+"""Check cpt_pause.peaks.peakdet against the original pure-Python loop"""
+import os
+import numpy
+import pytest
+
+import cpt_pause.io
+import cpt_pause.peaks as peaks
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+
+
+def peakdet_loop(v, delta, x=None):
+    """The original implementation of peakdet, see its docstring"""
+    maxtab = []
+    mintab = []
+
+    (v, x) = peaks._check_args(v, delta, x)
+
+    mn, mx = numpy.inf, -numpy.inf
+    mnpos, mxpos = numpy.nan, numpy.nan
+
+    lookformax = True
+
+    for i in numpy.arange(len(v)):
+        this = v[i]
+        if this > mx:
+            mx = this
+            mxpos = x[i]
+        if this < mn:
+            mn = this
+            mnpos = x[i]
+
+        if lookformax:
+            if this < mx - delta:
+                maxtab.append((mxpos, mx))
+                mn = this
+                mnpos = x[i]
+                lookformax = False
+        else:
+            if this > mn + delta:
+                mintab.append((mnpos, mn))
+                mx = this
+                mxpos = x[i]
+                lookformax = True
+
+    return numpy.array(maxtab, dtype=int), numpy.array(mintab, dtype=int)
+
+
+def synthetic(length, seed=42):
+    """Poisson read starts with the occasional strong pile-up"""
+    rng = numpy.random.RandomState(seed)
+    signal = rng.poisson(3, length)
+    spikes = rng.randint(0, length, length // 1000)
+    signal[spikes] += rng.randint(20, 200, len(spikes))
+    return signal
+
+
+def dense(length, seed=42):
+    """Coverage-like noise, which has a peak every few points at small
+    delta"""
+    return numpy.random.RandomState(seed).poisson(50, length)
+
+
+def mixed(length):
+    """Stretches of closely and widely spaced peaks, one after another"""
+    return numpy.concatenate((numpy.tile([0, 100], length // 8),
+                              synthetic(length // 4) * 10,
+                              dense(length // 4) * 2,
+                              numpy.zeros(length // 4, dtype=int)))
+
+
+def example(name):
+    with open(os.path.join(EXAMPLE, 'wig.%s.txt' % name)) as handle:
+        (positions, values) = list(cpt_pause.io.read_wig(handle).values())[0]
+    return values.astype(int)
+
+
+def _tables(v, idx):
+    return tuple(numpy.column_stack((i, v[i])).astype(int) for i in idx)
+
+
+def implementations():
+    impls = [('blocks', lambda v, d: _tables(v, peaks._peakdet_blocks(v, d)))]
+    if peaks._peakdet_kernel is not None:
+        impls.append(('numba', lambda v, d: _tables(v, peaks._peakdet_kernel(
+            numpy.asarray(v, dtype=numpy.float64), float(d)))))
+    impls.append(('peakdet', peaks.peakdet))
+    return impls
+
+
+def same(a, b):
+    return all(numpy.array_equal(numpy.asarray(x).reshape(-1, 2),
+                                 numpy.asarray(y).reshape(-1, 2))
+               for x, y in zip(a, b))
+
+
+SIGNALS = [(name, lambda name=name: example(name)) for name in
+           ('starts.f', 'starts.r', 'coverage.f', 'coverage.r')] + \
+    [('synthetic', lambda: synthetic(200000)),
+     ('dense', lambda: dense(20000)),
+     ('alternating', lambda: numpy.tile([0, 100], 10000)),
+     ('mixed', lambda: mixed(40000))]
+
+
+@pytest.mark.parametrize('delta', (5, 40, 100))
+@pytest.mark.parametrize('name, signal', SIGNALS,
+                         ids=[name for name, signal in SIGNALS])
+def test_peakdet_matches_loop(name, signal, delta):
+    v = signal()
+    expected = peakdet_loop(v, delta)
+    for impl_name, impl in implementations():
+        assert same(expected, impl(v, delta)), impl_name
+
+
+def test_peakdet_shapes():
+    """Tables have the shapes the loop gives them, even when empty"""
+    for v in (numpy.zeros(10, dtype=int), numpy.array([0, 50, 0, 50, 0])):
+        expected = peakdet_loop(v, 10)
+        result = peaks.peakdet(v, 10)
+        for a, b in zip(expected, result):
+            assert a.shape == b.shape
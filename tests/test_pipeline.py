@@ -0,0 +1,16 @@
+"""Check the in-memory workflow, cpt_pause.pipeline"""
+import os
+
+import cpt_pause.pipeline
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+
+
+def test_report_can_be_read_again():
+    # Contig lengths come from the BAM header, so no genome is needed
+    result = cpt_pause.pipeline.run(os.path.join(EXAMPLE, 'angus.bam'),
+                                    None, plot=False)
+    report = result.report
+    assert report.startswith('# PAUSE Report')
+    assert 'likely candidate for a repeat_region' in report
+    assert result.report == report
@@ -0,0 +1,61 @@
+"""Check cpt_pause.tiles renders regions, and survives a save/load"""
+import os
+import numpy
+import pytest
+
+import cpt_pause.bam
+import cpt_pause.pipeline
+import cpt_pause.tiles
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), os.pardir, 'example')
+
+
+@pytest.fixture(scope='module')
+def contig():
+    result = cpt_pause.pipeline.run(os.path.join(EXAMPLE, 'angus.bam'),
+                                    None, plot=False)
+    return cpt_pause.tiles.build(result)[0]
+
+
+def test_save_load(contig, tmpdir):
+    path = str(tmpdir.join('contig.npz'))
+    contig.save(path)
+    loaded = cpt_pause.tiles.ContigTiles.load(path)
+    assert (loaded.chrom, loaded.length) == (contig.chrom, contig.length)
+    assert numpy.array_equal(loaded.max_f, contig.max_f)
+    assert numpy.array_equal(loaded.max_r, contig.max_r)
+    for name in cpt_pause.tiles.ContigTiles.TRACKS:
+        levels = contig.pyramids[name].levels
+        assert sorted(loaded.pyramids[name].levels) == sorted(levels)
+        for size, (mean, maximum) in levels.items():
+            (loaded_mean, loaded_max) = loaded.pyramids[name].levels[size]
+            assert numpy.array_equal(loaded_mean, mean)
+            assert numpy.array_equal(loaded_max, maximum)
+    for (start, end) in ((0, 500), (12000, 14000), (0, contig.length)):
+        assert loaded.tile(start, end) == contig.tile(start, end)
+
+
+@pytest.mark.parametrize('start, end', [(100, 100), (200, 100),
+                                        (50000, 60000), (-20, 0)])
+def test_empty_region(contig, start, end):
+    with pytest.raises(ValueError):
+        contig.tile(start, end)
+
+
+def test_start_positions_kept(monkeypatch):
+    """Only the values of starts below the minimum are zeroed, not the
+    positions below it"""
+    pileup = cpt_pause.bam.Pileup('chrom', 100)
+    pileup.starts_f[:4] = [5, 6, 0, 7]
+
+    class Analysis(object):
+        max_f = max_r = []
+
+    contig = cpt_pause.tiles.ContigTiles.build(pileup, Analysis())
+    tracks = []
+    monkeypatch.setattr(cpt_pause.tiles, 'Coverage',
+                        lambda rows, **kwargs: tracks.append(rows) or
+                        cpt_pause.Coverage(rows, **kwargs))
+    contig.tile(0, 10, width=100)
+    starts_f = tracks[2]
+    assert starts_f[:4].tolist() == [[0, 5], [1, 6], [2, 0], [3, 7]]